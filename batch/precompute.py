@@ -0,0 +1,168 @@
+"""
+Precomputes the balance sheet, profit and loss and key metrics of every period and accounting book.
+
+Run from the repository root:
+
+    python -m batch.precompute --output month_end
+    python -m batch.precompute --destination Snowflake --database NETSUITE --schema REPORTING --books 1 2 --workers 8
+
+Each book's reports are loaded once, then every period is computed in a pool of worker processes
+and written to <output>/book_<id>/<period ending>.json. Snowflake credentials are read from
+SNOWFLAKE_USER, SNOWFLAKE_PASSWORD and SNOWFLAKE_ROLE, alongside SNOWFLAKE_ACCOUNT and SNOWFLAKE_WAREHOUSE.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from functions.env_utils import ACCOUNTING_BOOKS
+from functions.period_index import period_index_for
+from functions.query import fetch_report
+from functions.report import balance_sheet, key_metrics, profit_and_loss
+from functions.windows import WINDOWS
+
+DESTINATIONS = ["Dunder Mifflin Sample Data", "BigQuery", "Snowflake"]
+
+# Report frames of each book, set in every worker process by _init_worker
+_frames = {}
+
+
+def snowflake_params_from_env(database, schema):
+    """
+    Returns Snowflake connection parameters from environment variables, shaped like the app's session parameters.
+    """
+    return {
+        "account": os.environ.get("SNOWFLAKE_ACCOUNT"),
+        "user": os.environ.get("SNOWFLAKE_USER"),
+        "password": os.environ.get("SNOWFLAKE_PASSWORD"),
+        "role": os.environ.get("SNOWFLAKE_ROLE"),
+        "warehouse": os.environ.get("SNOWFLAKE_WAREHOUSE"),
+        "database": database,
+        "schema": schema,
+        "paramstyle": "qmark",
+    }
+
+
+def _sections(categories):
+    return [{
+        "category": category.name,
+        "total": category.total,
+        "account_types": [{
+            "account_type": account_type.name,
+            "total": account_type.total,
+            "accounts": account_type.accounts.to_dict(orient="records"),
+        } for account_type in category.account_types],
+    } for category in categories]
+
+
+def period_reports(book, ending):
+    """
+    Computes the reports of one book for the period ending on `ending`, as a JSON-serialisable dict.
+    """
+    bs_data, is_data = _frames[book]
+    layouts = balance_sheet(bs_data, ending, ending)
+    pnl = profit_and_loss(is_data, ending, ending)
+    metrics = key_metrics(bs_data, is_data, ending, ending)
+    return {
+        "accounting_book_id": book,
+        "period_ending": ending,
+        "period_name": period_index_for(bs_data).name_for(ending),
+        "balance_sheet": _sections(layouts[0].categories) if layouts else [],
+        "profit_and_loss": {
+            "categories": _sections(pnl.categories),
+            "revenue": pnl.revenue,
+            "expense": pnl.expense,
+            "net_profit": pnl.net_profit,
+        },
+        "key_metrics": dict(metrics._asdict(), income={
+            window: key_metrics(bs_data, is_data, ending, ending, window).income._asdict() for window in WINDOWS
+        }),
+    }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def _init_worker(frames):
+    _frames.update(frames)
+
+
+def _write(task, output):
+    book, ending = task
+    path = os.path.join(output, f"book_{book}", f"{ending.isoformat()}.json")
+    with open(path, "w") as f:
+        json.dump(period_reports(book, ending), f, default=_json_default, indent=2)
+    return path
+
+
+def _write_task(args):
+    return _write(*args)
+
+
+def load_books(destination, database, schema, books):
+    """
+    Returns {book: (balance sheet frame, income statement frame)} for every book in `books`.
+    Every model is loaded from its source, never from cached results or snapshots.
+    """
+    params = snowflake_params_from_env(database, schema) if destination == "Snowflake" else None
+    role = params["role"] if params else None
+    return {
+        book: tuple(
+            fetch_report(destination, database, schema, model, book, role=role, connection_params=params, fresh=True)
+            for model in ('bs', 'is')
+        )
+        for book in books
+    }
+
+
+def precompute(destination, database, schema, books, output, workers=None, periods=None):
+    """
+    Writes the reports of every period × book to `output` and returns the paths written.
+    With `periods`, only the latest `periods` periods of each book are computed.
+    """
+    frames = load_books(destination, database, schema, books)
+    tasks = []
+    for book, (bs_data, _) in frames.items():
+        if bs_data.empty:
+            continue
+        os.makedirs(os.path.join(output, f"book_{book}"), exist_ok=True)
+        endings = period_index_for(bs_data).endings
+        tasks += [((book, ending), output) for ending in endings[-periods if periods else 0:]]
+
+    # Frames are sent to each worker once, instead of with every task
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(frames,)) as executor:
+        return list(executor.map(_write_task, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the reports of every period and accounting book.")
+    parser.add_argument("--destination", choices=DESTINATIONS, default=DESTINATIONS[0], help="where the report data is read from")
+    parser.add_argument("--database", help="warehouse database holding the NetSuite models")
+    parser.add_argument("--schema", help="warehouse schema holding the NetSuite models")
+    parser.add_argument("--books", type=int, nargs="+", default=list(ACCOUNTING_BOOKS.values()), help="accounting book ids")
+    parser.add_argument("--periods", type=int, help="only the latest N periods of each book")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--output", default="precomputed", help="directory the reports are written to")
+    args = parser.parse_args(argv)
+
+    if args.destination != DESTINATIONS[0] and not (args.database and args.schema):
+        parser.error(f"--database and --schema are required for {args.destination}")
+
+    started = time.perf_counter()
+    paths = precompute(args.destination, args.database, args.schema, args.books, args.output, args.workers, args.periods)
+    print(f"Wrote {len(paths)} period reports to {args.output} in {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
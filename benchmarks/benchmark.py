@@ -0,0 +1,146 @@
+"""
+Times each stage of the report pipeline on synthetic NetSuite data.
+
+Run from the repository root:
+
+    python -m benchmarks.benchmark --rows 10000 100000 1000000
+    python -m benchmarks.benchmark --json results.json
+    python -m benchmarks.benchmark --baseline results.json
+
+With --baseline, the run exits with status 1 if any stage's median time is more than
+--tolerance (default 50%) slower than in the baseline file.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from functions.charts import revenue_vs_cogs
+from functions.cube import FinancialCube
+from functions.filters import filter_data
+from functions.layout import comparative_table, period_layouts, statement_layout
+from functions.normalise import normalise_frame
+from functions.period_index import PeriodIndex
+from functions.query import _prepare_dates
+from functions.synthetic import synthetic_report
+from functions.windows import income_metrics
+
+DEFAULT_ROWS = [10000, 100000, 1000000]
+
+
+def _load(model, rows, periods, books):
+    """
+    Generates a report and keeps the first book, since the app loads one book at a time.
+    """
+    raw = synthetic_report(model, rows=rows, periods=periods, books=books)
+    return raw[raw['accounting_book_id'] == 1].drop(columns='accounting_book_id').reset_index(drop=True)
+
+
+def _stages(bs_raw, is_raw, start, end):
+    """
+    Returns (name, function) pairs for every timed stage. Each call works on a fresh shallow
+    copy of the frames, so per-frame caches are cold as they are for a newly loaded report.
+    """
+    bs = normalise_frame(_prepare_dates(bs_raw.copy()))
+    is_ = normalise_frame(_prepare_dates(is_raw.copy()))
+    bs_range = filter_data(start=start, end=end, data_ref=bs)
+    is_range = filter_data(start=start, end=end, data_ref=is_, model='is')
+    balance_sheet = bs_range[~bs_range['account_category'].isin(['Income', 'Expense'])]
+
+    def date_filter_lookups():
+        index = PeriodIndex(bs.copy(deep=False)[['accounting_period_name', 'accounting_period_ending']].drop_duplicates())
+        names = index.names_descending()
+        return index.ending_for(names[-1]), index.ending_for(names[0])
+
+    def dashboard():
+        cube = FinancialCube(is_)
+        metrics = income_metrics(cube, end, 'range', start)
+        ttm = income_metrics(cube, end, 'ttm')
+        return metrics, ttm, revenue_vs_cogs(is_.copy(deep=False), start, end)
+
+    return [
+        ("query_results post-processing", lambda: normalise_frame(_prepare_dates(bs_raw.copy()))),
+        ("date_filter", date_filter_lookups),
+        ("filter_data", lambda: filter_data(start=start, end=end, data_ref=bs.copy(deep=False))),
+        ("balance sheet layout", lambda: period_layouts(balance_sheet)),
+        ("balance sheet comparative", lambda: comparative_table(bs.copy(deep=False), start, end, exclude_categories=['Income', 'Expense'])),
+        ("profit and loss layout", lambda: statement_layout(is_range)),
+        ("executive dashboard", dashboard),
+    ]
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings)
+
+
+def run(rows_list, periods=24, books=2, repeat=3, window=12):
+    """
+    Returns {rows: {stage: {"best_ms", "median_ms"}}} for every scale in `rows_list`.
+    `rows` is the size of each generated report across all books.
+    """
+    results = {}
+    for rows in rows_list:
+        bs_raw = _load('bs', rows, periods, books)
+        is_raw = _load('is', rows, periods, books)
+        endings = sorted(set(_prepare_dates(bs_raw[['accounting_period_ending']].drop_duplicates())['accounting_period_ending']))
+        start, end = endings[-min(window, len(endings))], endings[-1]
+
+        results[str(rows)] = {}
+        for name, function in _stages(bs_raw, is_raw, start, end):
+            best, median = _time(function, repeat)
+            results[str(rows)][name] = {"best_ms": round(best * 1000, 2), "median_ms": round(median * 1000, 2)}
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """
+    Returns a description of every stage whose median time exceeds its baseline by more than `tolerance`.
+    """
+    found = []
+    for rows, stages in results.items():
+        for name, timing in stages.items():
+            previous = baseline.get(rows, {}).get(name)
+            if previous and timing["median_ms"] > previous["median_ms"] * (1 + tolerance):
+                found.append(f"{name} at {rows} rows: {timing['median_ms']} ms (baseline {previous['median_ms']} ms)")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline on synthetic NetSuite data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="rows per generated report")
+    parser.add_argument("--periods", type=int, default=24, help="monthly periods per report")
+    parser.add_argument("--books", type=int, default=2, help="accounting books per report")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, periods=args.periods, books=args.books, repeat=args.repeat)
+
+    for rows, stages in results.items():
+        print(f"\n{int(rows):,} rows")
+        for name, timing in stages.items():
+            print(f"  {name:<32} best {timing['best_ms']:>10.2f} ms   median {timing['median_ms']:>10.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
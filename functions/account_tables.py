@@ -0,0 +1,65 @@
+import os
+import math
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from functions.layout import format_currency
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_PAGE_SIZE = 100
+
+
+def lazy_tables_enabled():
+    return os.environ.get("LAZY_ACCOUNT_TABLES", "false").lower() in ("1", "true", "yes")
+
+
+def account_table_page_size():
+    return int(os.environ.get("ACCOUNT_TABLE_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+
+
+@contextmanager
+def account_section(title, key):
+    """
+    Opens a collapsible section for an account type and yields whether its body should be rendered.
+
+    Streamlit sends the body of an expander even while it is collapsed. With LAZY_ACCOUNT_TABLES
+    enabled the section is a toggle instead, and its body is only built once it is switched on.
+    """
+    if not lazy_tables_enabled():
+        with st.expander(title):
+            yield True
+        return
+
+    if st.toggle(title, key=key):
+        with st.container(border=True):
+            yield True
+    else:
+        yield False
+
+
+def _formatted(accounts):
+    # Balances are formatted here, for the rows actually shown, rather than for every row of the report
+    return pd.DataFrame({
+        'account_name': accounts['account_name'].to_numpy(),
+        'formatted_balance': format_currency(accounts['balance']),
+    }, index=accounts.index)
+
+
+def account_table(accounts, key):
+    """
+    Renders an account list (`account_name`, `balance`) as a static table, or one page at a time
+    when it is longer than ACCOUNT_TABLE_PAGE_SIZE rows so only the visible page is formatted
+    and sent to the browser.
+    """
+    page_size = account_table_page_size()
+    if len(accounts) <= page_size:
+        st.table(_formatted(accounts))
+        return
+
+    pages = math.ceil(len(accounts) / page_size)
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    first = (page - 1) * page_size
+    st.dataframe(_formatted(accounts.iloc[first:first + page_size]), hide_index=True, width="stretch")
+    st.caption(f"Accounts {first + 1} to {min(first + page_size, len(accounts))} of {len(accounts)}")
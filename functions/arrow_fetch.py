@@ -0,0 +1,125 @@
+import os
+
+import pandas as pd
+
+# Dimension columns dictionary-encoded in Arrow so they arrive in pandas as categoricals
+DICTIONARY_COLUMNS = [
+    'accounting_period_name',
+    'account_category',
+    'account_name',
+    'account_type_name',
+]
+
+
+def arrow_fetch_enabled():
+    return os.environ.get("ARROW_FETCH", "true").lower() in ("1", "true", "yes")
+
+
+def table_from_batches(batches):
+    """
+    Concatenates Arrow record batches or tables, as yielded by `fetch_arrow_batches`, into one table.
+    Returns None if there were no batches.
+    """
+    import pyarrow as pa
+
+    tables = [batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch]) for batch in batches]
+    if not tables:
+        return None
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+
+def frame_from_arrow(table, description=None):
+    """
+    Converts an Arrow table into a report frame without materialising rows as Python objects.
+
+    Column names are lowercased, timestamps in `accounting_period_ending` are cast to dates and
+    dimension columns are dictionary-encoded, all on the Arrow side before conversion.
+    Without a table (a result with no batches), returns an empty frame with the columns named
+    in the cursor `description`, if given.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if table is None:
+        return pd.DataFrame(columns=[str(column[0]).lower() for column in description or []])
+
+    table = table.rename_columns([name.lower() for name in table.column_names])
+    for index, name in enumerate(table.column_names):
+        column = table.column(index)
+        if name == 'accounting_period_ending' and pa.types.is_timestamp(column.type):
+            table = table.set_column(index, name, pc.cast(column, pa.date32(), safe=False))
+        elif name in DICTIONARY_COLUMNS and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            table = table.set_column(index, name, pc.dictionary_encode(column))
+        elif pa.types.is_decimal(column.type):
+            table = table.set_column(index, name, pc.cast(column, pa.float64()))
+    return table.to_pandas()
+
+
+class FakeArrowCursor:
+    """
+    Stand-in for a Snowflake cursor that replays a fixed result as Arrow batches.
+
+    Allows the Arrow fetch path to run without a live warehouse; executed statements
+    are recorded in `executed`.
+    """
+
+    def __init__(self, table, batch_size=10000):
+        self.table = table
+        self.batch_size = batch_size
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        return self
+
+    @property
+    def description(self):
+        # Snowflake describes each column with a sequence whose first item is its name
+        return [(name,) for name in self.table.column_names]
+
+    def fetch_arrow_batches(self):
+        import pyarrow as pa
+
+        for batch in self.table.to_batches(max_chunksize=self.batch_size):
+            yield pa.Table.from_batches([batch])
+
+    def fetch_arrow_all(self):
+        return self.table
+
+    def fetch_pandas_all(self):
+        return self.table.to_pandas()
+
+    def close(self):
+        pass
+
+
+class FakeArrowConnection:
+    """
+    Stand-in for a Snowflake connection whose cursors replay `table`.
+    Accepts the connection parameters so it can be passed as the pool's `connect` function.
+    """
+
+    def __init__(self, table, **params):
+        self.table = table
+        self.params = params
+        self.cursors = []
+        self._closed = False
+
+    def cursor(self):
+        cursor = FakeArrowCursor(self.table)
+        self.cursors.append(cursor)
+        return cursor
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+    @classmethod
+    def from_frame(cls, frame, **params):
+        import pyarrow as pa
+
+        # Snowflake returns uppercase column names
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        return cls(table.rename_columns([name.upper() for name in table.column_names]), **params)
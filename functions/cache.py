@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_MB = 512
+
+# Cache key for a loaded report model. `variant` distinguishes range and period-list queries from the full model.
+ResultKey = namedtuple(
+    "ResultKey",
+    ["destination", "database", "schema", "model", "accounting_book_id", "role", "variant"],
+    defaults=(None,),
+)
+
+
+def enable_copy_on_write():
+    """
+    Turns on pandas copy-on-write where it is opt-in (pandas 2.x); from pandas 3 it is always on.
+
+    Cached frames are shared by every session. With copy-on-write, selections, slices and `assign`
+    on a shared frame reuse its memory until one of them is written to, so pages derive what they
+    need without defensive copies and cannot modify the shared frame by accident.
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+enable_copy_on_write()
+
+
+def frame_nbytes(frame):
+    """
+    Returns the in-memory size of a cached value in bytes.
+    DataFrames are measured deeply so object columns are accounted for.
+    """
+    try:
+        return int(frame.memory_usage(deep=True).sum())
+    except AttributeError:
+        return 0
+
+
+class CacheEntry:
+    """
+    A single cached query result along with the time it was fetched from its source
+    and the time it was stored in the cache. `stale` entries count as expired whatever their age.
+    """
+    __slots__ = ("value", "fetched_at", "stored_at", "nbytes", "stale")
+
+    def __init__(self, value, fetched_at, nbytes, stored_at=None):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.stored_at = stored_at if stored_at is not None else time.time()
+        self.nbytes = nbytes
+        self.stale = False
+
+    def age(self, now=None):
+        return (now if now is not None else time.time()) - self.fetched_at
+
+
+class ResultCache:
+    """
+    Process-wide result cache shared by every Streamlit session.
+
+    Entries expire `ttl_seconds` after they were stored and are evicted least-recently-used first
+    whenever the total size of the cached frames exceeds `max_bytes`.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def get_entry(self, key):
+        """
+        Returns the live CacheEntry for `key`, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.expired(entry):
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def peek(self, key, count=False):
+        """
+        Returns the CacheEntry for `key` even if it has expired, or None if missing.
+        Used to serve stale results while they are refreshed. With `count`, the lookup is
+        recorded in the hit and miss statistics like `get_entry`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            if count:
+                if entry is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            return entry
+
+    def expired(self, entry, now=None):
+        if entry.stale:
+            return True
+        return bool(self.ttl_seconds) and (now if now is not None else time.time()) - entry.stored_at > self.ttl_seconds
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    def put(self, key, value, fetched_at=None):
+        nbytes = frame_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Values larger than the whole budget are returned to the caller but never cached
+            if self.max_bytes and nbytes > self.max_bytes:
+                return value
+            self._entries[key] = CacheEntry(value, fetched_at if fetched_at is not None else time.time(), nbytes)
+            self._bytes += nbytes
+            self._evict()
+        return value
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for `key`, calling `loader()` and caching its result on a miss.
+        """
+        entry = self.get_entry(key)
+        if entry is not None:
+            return entry.value
+        return self.put(key, loader())
+
+    def invalidate(self, predicate=None):
+        """
+        Drops every entry whose key matches `predicate`, or the whole cache if no predicate is given.
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def expire(self, predicate=None):
+        """
+        Marks every entry whose key matches `predicate`, or all of them, as expired without dropping it,
+        so the next read still gets the current value while it is reloaded. Returns the number of entries marked.
+        """
+        with self._lock:
+            entries = [entry for key, entry in self._entries.items() if predicate is None or predicate(key)]
+            for entry in entries:
+                entry.stale = True
+            return len(entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def _evict(self):
+        while self.max_bytes and self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Returns the process-wide ResultCache, creating it on first use.
+    TTL and memory budget are read from RESULT_CACHE_TTL_SECONDS and RESULT_CACHE_MAX_MB.
+    """
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                ttl_seconds = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+                max_mb = int(os.environ.get("RESULT_CACHE_MAX_MB", DEFAULT_MAX_MB))
+                _result_cache = ResultCache(ttl_seconds=ttl_seconds, max_bytes=max_mb * 1024 * 1024)
+    return _result_cache
+
+
+_derived = {}
+_derived_lock = threading.Lock()
+
+
+def derived(frame, name, build):
+    """
+    Returns the object `build()` computes from `frame`, building it once per frame and name.
+
+    Cached frames are shared by every session, so objects derived from them (cubes, indexes)
+    are shared too, and dropped together with the frame once it is evicted and released.
+    """
+    key = (id(frame), name)
+    with _derived_lock:
+        cached = _derived.get(key)
+        if cached is not None and cached[0]() is frame:
+            return cached[1]
+
+    value = build()
+    with _derived_lock:
+        _derived[key] = (weakref.ref(frame), value)
+        weakref.finalize(frame, _derived.pop, key, None)
+    return value
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from functions.cache import derived
+from functions.filters import filter_data
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_CHART_MAX_POINTS = 24
+
+# Chart titles for each bucket size, keyed by its axis label
+BUCKET_TITLES = {
+    'Month': 'Monthly',
+    'Quarter': 'Quarterly',
+    'Year': 'Yearly',
+}
+
+
+def chart_max_points():
+    return int(os.environ.get("CHART_MAX_POINTS", DEFAULT_CHART_MAX_POINTS))
+
+
+def _buckets(endings, max_points):
+    """
+    Returns (bucket, label) arrays for the period endings and the bucket size's axis label: months,
+    or quarters or years when there are more than `max_points` months. Buckets are integers that
+    sort chronologically.
+    """
+    years = endings.dt.year.to_numpy()
+    months = endings.dt.month.to_numpy()
+
+    month_buckets = years * 12 + months - 1
+    if len(np.unique(month_buckets)) <= max_points:
+        # Month names alone are only unambiguous within a single year
+        labels = endings.dt.strftime('%B' if len(np.unique(years)) == 1 else '%b %Y')
+        return month_buckets, labels.to_numpy(), 'Month'
+
+    quarters = (months - 1) // 3 + 1
+    quarter_buckets = years * 4 + quarters - 1
+    if len(np.unique(quarter_buckets)) <= max_points:
+        labels = pd.Series(quarters).astype(str).radd('Q') + ' ' + pd.Series(years).astype(str)
+        return quarter_buckets, labels.to_numpy(), 'Quarter'
+
+    return years, years.astype(str), 'Year'
+
+
+def revenue_vs_cogs(data, start, end, max_points=None):
+    """
+    Returns the chart data for revenue against COGS over the periods ending between `start` and
+    `end`, with one row per month (or per quarter or year over long ranges) in chronological order
+    and `label`, `Income` and `COGS` columns, and the bucket size's axis label ('Month', 'Quarter'
+    or 'Year'). Amounts are summed absolute balances.
+
+    Cached per loaded frame and range.
+    """
+    max_points = max_points or chart_max_points()
+    return derived(data, ('revenue_vs_cogs', start, end, max_points), lambda: _revenue_vs_cogs(data, start, end, max_points))
+
+
+def _revenue_vs_cogs(data, start, end, max_points):
+    frame = filter_data(start=start, end=end, data_ref=data, model='is')
+    income = (frame['account_category'] == 'Income').to_numpy()
+    cogs = (frame['account_type_name'] == 'Cost of Goods Sold').to_numpy()
+    frame = frame[income | cogs]
+    income, cogs = income[income | cogs], cogs[income | cogs]
+
+    # One datetime conversion for every derived axis value
+    buckets, labels, unit = _buckets(pd.to_datetime(pd.Series(frame['accounting_period_ending'].to_numpy())), max_points)
+    amounts = np.abs(frame['balance'].to_numpy(dtype=float))
+
+    grouped = pd.DataFrame({
+        'bucket': buckets,
+        'label': labels,
+        'Income': np.where(income, amounts, 0.0),
+        'COGS': np.where(cogs, amounts, 0.0),
+        'has_income': income,
+        'has_cogs': cogs,
+    }).groupby('bucket', sort=True).agg(
+        label=('label', 'first'), Income=('Income', 'sum'), COGS=('COGS', 'sum'),
+        has_income=('has_income', 'any'), has_cogs=('has_cogs', 'any'),
+    )
+
+    # Only buckets with both revenue and COGS rows are charted
+    grouped = grouped[grouped['has_income'] & grouped['has_cogs']]
+    return grouped[['label', 'Income', 'COGS']].reset_index(drop=True), unit
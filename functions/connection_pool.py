@@ -0,0 +1,266 @@
+import os
+import hashlib
+import threading
+import time
+
+from functions.arrow_fetch import frame_from_arrow, table_from_batches
+from functions.instrumentation import record_stage
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_MAX_SIZE = 4
+DEFAULT_MAX_TOTAL = 16
+DEFAULT_IDLE_TIMEOUT_SECONDS = 900
+DEFAULT_HEALTH_CHECK_SECONDS = 60
+DEFAULT_ACQUIRE_TIMEOUT_SECONDS = 30
+
+
+def _snowflake_connect(**params):
+    import snowflake.connector
+    return snowflake.connector.connect(**params)
+
+
+def credentials_key(params):
+    """
+    Returns a stable hash of the connection parameters so credentials are never kept as pool keys.
+    """
+    raw = "\x00".join(f"{name}={params[name]}" for name in sorted(params))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PooledConnection:
+    """
+    A Snowflake connection leased from the pool.
+
+    Use it as a context manager; the connection is returned to the pool on exit,
+    or discarded if it died while in use.
+    """
+
+    def __init__(self, pool, key, raw, generation=0):
+        self.pool = pool
+        self.key = key
+        self.raw = raw
+        self.generation = generation
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def query(self, sql, params=None, arrow=False):
+        """
+        Runs `sql` and returns the result as a pandas DataFrame.
+        With `arrow`, the result is pulled as Arrow batches and kept columnar until conversion.
+        """
+        cursor = self.raw.cursor()
+        try:
+            cursor.execute(sql, params)
+            if arrow:
+                # A result without rows has no batches, so the columns come from the cursor description
+                return frame_from_arrow(table_from_batches(cursor.fetch_arrow_batches()), cursor.description)
+            return cursor.fetch_pandas_all()
+        finally:
+            cursor.close()
+
+    def is_alive(self):
+        try:
+            if self.raw.is_closed():
+                return False
+            cursor = self.raw.cursor()
+            try:
+                cursor.execute("select 1")
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self)
+        return False
+
+
+class SnowflakeConnectionPool:
+    """
+    Process-wide pool of Snowflake connections, keyed by credentials.
+
+    Connections are reused across Streamlit sessions and reruns so the login handshake only
+    happens when credentials change or a pooled connection has died. Each credential set holds
+    at most `max_size` connections and the whole pool at most `max_total`; when the pool is full,
+    the least recently used idle connection of another credential set is closed to make room.
+    Idle connections are health-checked before reuse, and a background thread closes them after
+    `idle_timeout` seconds without use, also once traffic has stopped.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT_SECONDS,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_SECONDS,
+                 acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT_SECONDS, connect=_snowflake_connect,
+                 max_total=DEFAULT_MAX_TOTAL):
+        self.max_size = max_size
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._connect = connect
+        self._idle = {}
+        self._in_use = {}
+        self._generation = 0
+        self._condition = threading.Condition()
+        self._reaper = None
+
+    def acquire(self, params):
+        """
+        Leases a connection for `params`, reusing a healthy idle one when available.
+        Blocks for up to `acquire_timeout` seconds when the credential's pool is exhausted.
+        """
+        key = credentials_key(params)
+        deadline = time.time() + self.acquire_timeout
+        started = time.perf_counter()
+
+        with self._condition:
+            self._evict_idle()
+            while True:
+                idle = self._idle.get(key, [])
+                if idle:
+                    conn = idle.pop()
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    break
+                if self._size(key) < self.max_size and (self._total() < self.max_total or self._evict_lru_idle()):
+                    conn = None
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free Snowflake connection")
+                self._condition.wait(remaining)
+
+        # Connecting and health checks happen outside the lock so other credentials are not blocked
+        try:
+            if conn is not None and time.time() - conn.last_used > self.health_check_interval and not conn.is_alive():
+                conn.close()
+                conn = None
+            reused = conn is not None
+            if conn is None:
+                conn = PooledConnection(self, key, self._connect(**params), self._generation)
+        except Exception:
+            with self._condition:
+                self._in_use[key] -= 1
+                self._condition.notify_all()
+            raise
+
+        conn.last_used = time.time()
+        self._start_reaper()
+        # Reusing a pooled connection counts as a cache hit, opening a new one as a miss
+        record_stage("warehouse_connect", time.perf_counter() - started, cache="hit" if reused else "miss")
+        return conn
+
+    def release(self, conn):
+        """
+        Returns a leased connection to the pool, dropping it if it has been closed
+        or was leased before the last `close_all`.
+        """
+        with self._condition:
+            self._in_use[conn.key] -= 1
+            conn.last_used = time.time()
+            try:
+                closed = conn.raw.is_closed()
+            except Exception:
+                closed = True
+            if closed or conn.generation != self._generation:
+                conn.close()
+            else:
+                self._idle.setdefault(conn.key, []).append(conn)
+            self._condition.notify_all()
+
+    def close_all(self):
+        """
+        Closes every idle connection; connections leased at the time are closed when they are returned.
+        """
+        with self._condition:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                "credentials": len(set(self._idle) | set(k for k, v in self._in_use.items() if v)),
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "in_use": sum(self._in_use.values()),
+            }
+
+    def _size(self, key):
+        return len(self._idle.get(key, [])) + self._in_use.get(key, 0)
+
+    def _total(self):
+        return sum(len(idle) for idle in self._idle.values()) + sum(self._in_use.values())
+
+    def _evict_lru_idle(self):
+        # Closes the least recently used idle connection to make room; called with the lock held
+        idle = [(conn.last_used, key, conn) for key, conns in self._idle.items() for conn in conns]
+        if not idle:
+            return False
+        _, key, conn = min(idle, key=lambda item: item[0])
+        self._idle[key].remove(conn)
+        if not self._idle[key]:
+            del self._idle[key]
+        conn.close()
+        return True
+
+    def _start_reaper(self):
+        if self._reaper is not None:
+            return
+        with self._condition:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="snowflake-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        # Closes idle connections past their timeout even when no new lease triggers an eviction
+        while True:
+            time.sleep(max(1, min(self.idle_timeout, self.health_check_interval)))
+            with self._condition:
+                self._evict_idle()
+
+    def _evict_idle(self):
+        now = time.time()
+        for key in list(self._idle):
+            keep = []
+            for conn in self._idle[key]:
+                if now - conn.last_used > self.idle_timeout:
+                    conn.close()
+                else:
+                    keep.append(conn)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    Returns the process-wide SnowflakeConnectionPool, creating it on first use.
+    Limits are read from SNOWFLAKE_POOL_MAX_SIZE, SNOWFLAKE_POOL_MAX_TOTAL and SNOWFLAKE_POOL_IDLE_TIMEOUT_SECONDS.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = SnowflakeConnectionPool(
+                    max_size=int(os.environ.get("SNOWFLAKE_POOL_MAX_SIZE", DEFAULT_MAX_SIZE)),
+                    max_total=int(os.environ.get("SNOWFLAKE_POOL_MAX_TOTAL", DEFAULT_MAX_TOTAL)),
+                    idle_timeout=int(os.environ.get("SNOWFLAKE_POOL_IDLE_TIMEOUT_SECONDS", DEFAULT_IDLE_TIMEOUT_SECONDS)),
+                )
+    return _connection_pool
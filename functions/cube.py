@@ -0,0 +1,175 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+from functions.cache import derived
+from functions.normalise import period_dates
+
+# Aggregation levels of the cube, from coarsest to finest
+LEVELS = {
+    'category': ['account_category'],
+    'account_type': ['account_category', 'account_type_name'],
+    'account': ['account_category', 'account_type_name', 'account_name'],
+}
+
+
+class FinancialCube:
+    """
+    Pre-aggregated balances by period × category × account type × account.
+
+    The cube is built once per loaded frame. Balances are held as a periods × accounts matrix
+    of prefix sums, so the total of any level over any period range is a subtraction of two rows
+    and single lookups don't scan the underlying frame.
+    """
+
+    def __init__(self, data):
+        data = data[data['accounting_period_ending'].notna()]
+
+        # Sorted periods; the position of a period in this list is its integer period key
+        periods = data[['accounting_period_ending', 'accounting_period_name']].drop_duplicates('accounting_period_ending')
+        periods = periods.sort_values('accounting_period_ending', ignore_index=True)
+        self.period_endings = period_dates(periods['accounting_period_ending'])
+        self.period_names = list(periods['accounting_period_name'])
+
+        period_key = np.searchsorted(periods['accounting_period_ending'].to_numpy(), data['accounting_period_ending'].to_numpy()).astype(np.int32)
+        frame = pd.DataFrame({
+            'period_key': period_key,
+            'account_category': pd.Categorical(data['account_category']),
+            'account_type_name': pd.Categorical(data['account_type_name']),
+            'account_name': pd.Categorical(data['account_name']),
+            'balance': data['balance'].astype(float).to_numpy(),
+        })
+
+        # Long frame of balances per period and account, ordered by period key
+        self.frame = frame.groupby(['period_key'] + LEVELS['account'], observed=True, sort=True)['balance'].sum().reset_index()
+
+        # One column per account, in first-seen order so sections render in report order
+        account_order = frame[LEVELS['account']].drop_duplicates(ignore_index=True)
+        self.accounts = account_order
+        account_index = pd.MultiIndex.from_frame(account_order.astype(str))
+        account_codes = account_index.get_indexer(pd.MultiIndex.from_frame(self.frame[LEVELS['account']].astype(str)))
+
+        matrix = np.zeros((len(self.period_endings), len(account_order)))
+        np.add.at(matrix, (self.frame['period_key'].to_numpy(), account_codes), self.frame['balance'].to_numpy())
+        self._prefix = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0)])
+
+        # Prefix sums for the coarser levels, with lowercased member names for lookups
+        self._levels = {'account': (account_order.reset_index(drop=True), self._prefix)}
+        for level in ('category', 'account_type'):
+            members = account_order[LEVELS[level]].drop_duplicates(ignore_index=True)
+            codes = pd.MultiIndex.from_frame(members.astype(str)).get_indexer(
+                pd.MultiIndex.from_frame(account_order[LEVELS[level]].astype(str))
+            )
+            prefix = np.zeros((self._prefix.shape[0], len(members)))
+            np.add.at(prefix.T, codes, self._prefix.T)
+            self._levels[level] = (members, prefix)
+
+        self._lowered = {
+            column: account_order[column].astype(str).str.lower().to_numpy()
+            for column in LEVELS['account']
+        }
+        self._match_cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def period_slice(self, start=None, end=None):
+        """
+        Returns the (lo, hi) period key bounds covering periods ending between `start` and `end` inclusive.
+        """
+        lo = 0 if start is None else bisect_left(self.period_endings, start)
+        hi = len(self.period_endings) if end is None else bisect_right(self.period_endings, end)
+        return lo, max(lo, hi)
+
+    def latest_period(self, start=None, end=None):
+        """
+        Returns the latest period ending within the range, or None if the range is empty.
+        """
+        lo, hi = self.period_slice(start, end)
+        return self.period_endings[hi - 1] if hi > lo else None
+
+    def period_name(self, ending):
+        return self.period_names[bisect_left(self.period_endings, ending)]
+
+    def rollup(self, start=None, end=None, level='account'):
+        """
+        Returns a frame of the level's members with their total balance over the period range.
+        """
+        members, prefix = self._levels[level]
+        lo, hi = self.period_slice(start, end)
+        # Members are shared by every rollup of the level; assign leaves them untouched
+        return members.assign(balance=prefix[hi] - prefix[lo])
+
+    def period_matrix(self, start=None, end=None, level='account'):
+        """
+        Returns (members, balances) for the level, where `balances` has one row per member and
+        one column per period in the range, oldest period first.
+        """
+        members, prefix = self._levels[level]
+        lo, hi = self.period_slice(start, end)
+        return members, np.diff(prefix[lo:hi + 1], axis=0).T
+
+    def total(self, start=None, end=None, category=None, account_type=None):
+        """
+        Returns the total balance over the period range, optionally restricted to one
+        account category and/or account type (matched case-insensitively).
+        """
+        mask = self._mask(category, account_type)
+        return self._masked_total(mask, start, end)
+
+    def prefix_totals(self, category=None, account_type=None):
+        """
+        Returns the cumulative total per period of the matching accounts, so the total over
+        any period range (lo, hi) from `period_slice` is `totals[hi] - totals[lo]`.
+        """
+        key = ('prefix', category and category.lower(), account_type and account_type.lower())
+        with self._lock:
+            if key not in self._match_cache:
+                self._match_cache[key] = self._prefix[:, self._mask(category, account_type)].sum(axis=1)
+            return self._match_cache[key]
+
+    def total_matching(self, text, start=None, end=None):
+        """
+        Returns the total balance over the period range of accounts whose name contains `text`.
+        """
+        return self._masked_total(self._name_mask(text), start, end)
+
+    def series(self, start=None, end=None, category=None, account_type=None, name_contains=None):
+        """
+        Returns the balance per period across the range as a Series indexed by period ending.
+        """
+        mask = self._mask(category, account_type)
+        if name_contains is not None:
+            mask &= self._name_mask(name_contains)
+        lo, hi = self.period_slice(start, end)
+        cumulative = self._prefix[lo:hi + 1][:, mask].sum(axis=1)
+        return pd.Series(np.diff(cumulative), index=self.period_endings[lo:hi], name='balance')
+
+    def _mask(self, category=None, account_type=None):
+        mask = np.ones(len(self.accounts), dtype=bool)
+        if category is not None:
+            mask &= self._lowered['account_category'] == category.lower()
+        if account_type is not None:
+            mask &= self._lowered['account_type_name'] == account_type.lower()
+        return mask
+
+    def _name_mask(self, text):
+        text = text.lower()
+        with self._lock:
+            if text not in self._match_cache:
+                self._match_cache[text] = np.char.find(self._lowered['account_name'].astype(str), text) >= 0
+            return self._match_cache[text]
+
+    def _masked_total(self, mask, start, end):
+        lo, hi = self.period_slice(start, end)
+        return float(self._prefix[hi, mask].sum() - self._prefix[lo, mask].sum())
+
+
+def cube_for(data):
+    """
+    Returns the FinancialCube for a loaded frame, building it on first use.
+    """
+    return derived(data, 'cube', lambda: FinancialCube(data))
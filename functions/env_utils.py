@@ -1,6 +1,20 @@
 import os
+import json
+import hashlib
 import streamlit as st
 from pathlib import Path
+from functions.cache import get_result_cache
+from functions.connection_pool import get_connection_pool
+from functions.figures import get_figure_cache
+from functions.instrumentation import get_stage_recorder, sample_dict
+from functions.single_flight import get_warehouse_flight
+from functions.snapshot import get_snapshot_store
+
+# Accounting books that can be selected, by name
+ACCOUNTING_BOOKS = {
+    "IFRS Accounting Book": 1,
+    "WPP Account Book": 2
+}
 
 def display_sidebar_config():
     """
@@ -41,106 +55,183 @@ def display_sidebar_config():
     if 'accounting_book' not in st.session_state:
         st.session_state.accounting_book = 1  # Default to IFRS
 
-    # Create mapping of names to IDs
-    accounting_books = {
-        "IFRS Accounting Book": 1,
-        "WPP Account Book": 2
-    }
-    
-    # Create the dropdown using the names
+    # Create the dropdown using the names, showing the book currently in use
+    book_names = list(ACCOUNTING_BOOKS.keys())
+    book_ids = list(ACCOUNTING_BOOKS.values())
     selected_name = st.sidebar.selectbox(
         "Select Account Book",
-        options=list(accounting_books.keys()),
-        index=0  # Default to first option (IFRS)
+        options=book_names,
+        index=book_ids.index(st.session_state.accounting_book) if st.session_state.accounting_book in book_ids else 0
     )
 
+    # Results are cached per book, so switching books only changes which cached frames are read
+    if ACCOUNTING_BOOKS[selected_name] != st.session_state.accounting_book:
+        st.session_state.accounting_book = ACCOUNTING_BOOKS[selected_name]
+        st.rerun()
+
     # Add save button to update credentials and refresh
     if st.sidebar.button("Save Credentials"):
         st.session_state.snowflake_username = snowflake_username
         st.session_state.snowflake_password = snowflake_password
         st.session_state.snowflake_role = snowflake_role
-        st.session_state.accounting_book = accounting_books[selected_name]
-
-        # Clear any cached connections when credentials change
-        if 'snowflake' in st.session_state:
-            del st.session_state['snowflake']
-            
-        # Clear any cached data
-        st.cache_data.clear()
-        
+
+        # Cached results are keyed by role and accounting book, so nothing needs clearing
         st.rerun()  # This will refresh the app and apply the new credentials
 
-def setup_snowflake_connection():
+    # Drop the shared cached results for the current role and book so the next load hits the warehouse
+    if st.sidebar.button("Refresh Data"):
+        role = st.session_state.snowflake_role or None
+        book = st.session_state.accounting_book
+        matches = lambda key: key.accounting_book_id == book and key.role in (role, None)
+        # Also drops the watermarks kept for incremental fetching, which live in the result cache,
+        # so the next load fetches every period again
+        get_result_cache().invalidate(matches)
+        # Drop on-disk snapshots too, otherwise the next load would serve them again
+        if get_snapshot_store() is not None:
+            get_snapshot_store().invalidate(matches)
+        st.rerun()
+
+    if is_admin():
+        display_performance_panel()
+
+def admin_users():
     """
-    Set up Snowflake connection configuration.
-    
+    Returns the lowercased Snowflake usernames listed in ADMIN_USERS (comma separated).
+    """
+    return {user.strip().lower() for user in os.environ.get("ADMIN_USERS", "").split(",") if user.strip()}
+
+def is_admin():
+    """
+    Returns True if the session's Snowflake user is listed in ADMIN_USERS and their
+    credentials have connected successfully, so a typed username alone is not enough.
+    """
+    username = st.session_state.get('snowflake_username', "").strip().lower()
+    return bool(username) and username in admin_users() and credentials_verified()
+
+def display_performance_panel():
+    """
+    Display the per-stage latency of the report pipeline and the shared cache statistics in the sidebar.
+    Only shown to admins; figures cover every session served by this process.
+    """
+    recorder = get_stage_recorder()
+    with st.sidebar.expander("Performance"):
+        summary = recorder.summary()
+        if summary:
+            st.dataframe(summary, hide_index=True, width="stretch")
+        else:
+            st.caption("No stages recorded yet.")
+
+        st.caption("Shared caches")
+        st.json({
+            "results": get_result_cache().stats(),
+            "figures": get_figure_cache().stats(),
+            "warehouse_queries": get_warehouse_flight().stats(),
+            "connections": get_connection_pool().stats(),
+        }, expanded=False)
+
+        st.download_button("Prometheus metrics", recorder.prometheus_text(), file_name="metrics.prom", mime="text/plain")
+        st.download_button(
+            "Stage log (JSON lines)",
+            "\n".join(json.dumps(sample_dict(sample), default=str) for sample in recorder.samples()),
+            file_name="stages.jsonl",
+            mime="application/x-ndjson",
+        )
+
+def credentials_fingerprint():
+    """
+    Returns a hash identifying the Snowflake credentials held in session state.
+    """
+    raw = "\x00".join([
+        st.session_state.get('snowflake_username', ""),
+        st.session_state.get('snowflake_password', ""),
+        st.session_state.get('snowflake_role', ""),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def mark_credentials_verified():
+    """
+    Records that the current session credentials opened a Snowflake connection successfully.
+    """
+    st.session_state.snowflake_verified = credentials_fingerprint()
+
+def verify_snowflake_credentials():
+    """
+    Checks the current session credentials by leasing a pooled connection, marking them verified on success.
+    A connection already pooled for the same credentials is reused, so this is usually free.
+    """
+    conn = setup_snowflake_connection()
+    if conn is None:
+        return False
+    with conn:
+        pass
+    mark_credentials_verified()
+    return True
+
+def credentials_verified():
+    """
+    Returns True if the current session credentials have already connected to Snowflake.
+    Shared cached results are only served to sessions that pass this check.
+    """
+    return st.session_state.get('snowflake_verified') == credentials_fingerprint()
+
+def snowflake_connection_params():
+    """
+    Build the Snowflake connection parameters for the current session.
+
     Always uses username and password from session state.
-    For account, role, and warehouse:
+    For account and warehouse:
     - Uses values from secrets.toml if it exists
     - Falls back to environment variables if secrets.toml doesn't exist
-    
+
     Returns:
-        The Snowflake connection object that can be used for queries, or None if credentials are not provided.
+        A dict of connection parameters, or None if credentials are not provided.
     """
     # Check if credentials are provided in session state
-    if hasattr(st.session_state, 'snowflake_username') and st.session_state.snowflake_username and \
-       hasattr(st.session_state, 'snowflake_password') and st.session_state.snowflake_password and \
-       hasattr(st.session_state, 'snowflake_role') and st.session_state.snowflake_role:
-        
-        # Check if .streamlit/secrets.toml exists for account, role, and warehouse
-        secrets_path = Path(".streamlit/secrets.toml")
-        
-        if secrets_path.exists():
-            # If secrets.toml exists, use it for account, role, and warehouse
-            # But still use session state for username and password
-            try:
-                # Create a custom connection with session state credentials
-                # Set ttl=0 to disable caching and ensure fresh data is always fetched
-                conn = st.connection(
-                    "", 
-                    type='snowflake', 
-                    account=st.secrets["connections"]["snowflake"]["account"],
-                    user=st.session_state.snowflake_username,
-                    password=st.session_state.snowflake_password,
-                    role=st.session_state.snowflake_role,
-                    warehouse=st.secrets["connections"]["snowflake"]["warehouse"],
-                    database=st.session_state.database,
-                    schema=st.session_state.schema,
-                    client_session_keep_alive=True,
-                    ttl=0  # Disable caching to always use fresh data
-                )
-                
-                # Reset the connection to ensure no cached data is used
-                conn.reset()
-                
-                return conn
-            except Exception as e:
-                st.error(f"Error connecting to Snowflake: {e}")
-                return None
-        else:
-            # If secrets.toml doesn't exist, use environment variables for account, role, and warehouse
-            try:
-                conn = st.connection(
-                    "", 
-                    type='snowflake', 
-                    account=os.environ.get("SNOWFLAKE_ACCOUNT"),
-                    user=st.session_state.snowflake_username,
-                    password=st.session_state.snowflake_password,
-                    role=st.session_state.snowflake_role,
-                    warehouse=os.environ.get("SNOWFLAKE_WAREHOUSE"),
-                    database=st.session_state.database,
-                    schema=st.session_state.schema,
-                    client_session_keep_alive=True,
-                    ttl=0  # Disable caching to always use fresh data
-                )
-                
-                # Reset the connection to ensure no cached data is used
-                conn.reset()
-                
-                return conn
-            except Exception as e:
-                st.error(f"Error connecting to Snowflake: {e}")
-                return None
+    if not (st.session_state.get('snowflake_username') and st.session_state.get('snowflake_password')
+            and st.session_state.get('snowflake_role')):
+        return None
+
+    # Check if .streamlit/secrets.toml exists for account and warehouse
+    secrets_path = Path(".streamlit/secrets.toml")
+
+    if secrets_path.exists():
+        account = st.secrets["connections"]["snowflake"]["account"]
+        warehouse = st.secrets["connections"]["snowflake"]["warehouse"]
     else:
-        # If no credentials in session state, return None
+        account = os.environ.get("SNOWFLAKE_ACCOUNT")
+        warehouse = os.environ.get("SNOWFLAKE_WAREHOUSE")
+
+    return {
+        "account": account,
+        "user": st.session_state.snowflake_username,
+        "password": st.session_state.snowflake_password,
+        "role": st.session_state.snowflake_role,
+        "warehouse": warehouse,
+        "database": st.session_state.database,
+        "schema": st.session_state.schema,
+        "client_session_keep_alive": True,
+        # Server-side binding keeps statement text identical across books and users
+        "paramstyle": "qmark",
+    }
+
+def setup_snowflake_connection():
+    """
+    Lease a Snowflake connection for the current session credentials.
+
+    Connections come from the process-wide pool, so logging in only happens when the
+    credentials change or a pooled connection has died. Use the result as a context
+    manager to hand the connection back to the pool when done.
+
+    Returns:
+        A pooled connection exposing `query(sql)`, or None if credentials are not provided
+        or the connection failed.
+    """
+    params = snowflake_connection_params()
+    if params is None:
+        return None
+
+    try:
+        return get_connection_pool().acquire(params)
+    except Exception as e:
+        st.error(f"Error connecting to Snowflake: {e}")
         return None
@@ -0,0 +1,99 @@
+import os
+import itertools
+import threading
+from collections import OrderedDict
+
+from functions.cache import derived
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_FIGURE_CACHE_MAX_MB = 64
+
+_versions = itertools.count(1)
+
+
+def dataset_version(frame):
+    """
+    Returns a number identifying a loaded frame for as long as it is alive.
+    A reloaded frame gets a new number, so figures built from the old one are never reused.
+    """
+    return derived(frame, 'version', lambda: next(_versions))
+
+
+class FigureCache:
+    """
+    Process-wide cache of built Plotly figures.
+
+    Building a figure with plotly express costs far more than handing a built one to Streamlit,
+    so figures are kept per (dataset versions, date range, chart type) and evicted least-recently-used
+    first once the total size of their JSON exceeds `max_bytes`. Cached figures are shared and must
+    not be modified.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_FIGURE_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        """
+        Returns the figure cached for `key`, calling `build()` and caching its result on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        figure = build()
+        nbytes = len(figure.to_json())
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if not self.max_bytes or nbytes <= self.max_bytes:
+                self._entries[key] = (figure, nbytes)
+                self._bytes += nbytes
+                while self.max_bytes and self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+        return figure
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_figure_cache = None
+_figure_cache_lock = threading.Lock()
+
+
+def get_figure_cache():
+    """
+    Returns the process-wide FigureCache, creating it on first use.
+    Its memory budget is read from FIGURE_CACHE_MAX_MB.
+    """
+    global _figure_cache
+    if _figure_cache is None:
+        with _figure_cache_lock:
+            if _figure_cache is None:
+                max_mb = int(os.environ.get("FIGURE_CACHE_MAX_MB", DEFAULT_FIGURE_CACHE_MAX_MB))
+                _figure_cache = FigureCache(max_bytes=max_mb * 1024 * 1024)
+    return _figure_cache
+
+
+def cached_figure(frames, start, end, chart, build):
+    """
+    Returns the figure of type `chart` built from `frames` over the range, building it on first use.
+    """
+    key = (tuple(dataset_version(frame) for frame in frames), start, end, chart)
+    return get_figure_cache().get_or_build(key, build)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from functions.cache import derived
+from functions.cube import cube_for
+
+# Separator between the levels of NetSuite account names, e.g. "Expense : Payroll"
+SEPARATOR = ':'
+
+
+def split_levels(names, separator=SEPARATOR):
+    """
+    Splits "A : B : C" account names into one column per level, named level_1, level_2, ...
+    Only the distinct names are split, so the cost does not grow with the number of rows.
+    Levels past a name's depth are missing.
+    """
+    names = pd.Categorical(names)
+    parts = pd.Series(names.categories).str.split(separator, expand=True)
+    codes = names.codes
+    columns = {}
+    for position in parts.columns:
+        level = parts[position].str.strip().to_numpy(dtype=object)
+        columns[f"level_{position + 1}"] = np.where(codes >= 0, level[codes], None)
+    return pd.DataFrame(columns)
+
+
+class AccountHierarchy:
+    """
+    Account tree parsed once from the colon-delimited account names of a cube.
+
+    Nodes are identified by their path (account category, level_1, ..., level_k). Each depth holds
+    prefix sums of its nodes' balances per period, so the rollup of any depth over any period range
+    is a subtraction of two rows, as in FinancialCube.
+    """
+
+    def __init__(self, cube, separator=SEPARATOR):
+        self.cube = cube
+        members, balances = cube.period_matrix(level='account')
+        levels = split_levels(members['account_name'], separator)
+        self.depth = len(levels.columns)
+        self.levels = pd.concat([members[['account_category']].astype(str).reset_index(drop=True), levels], axis=1)
+
+        prefix = np.vstack([np.zeros((1, len(members))), np.cumsum(balances.T, axis=0)])
+        self._rollups = {}
+        self._children = {}
+        for depth in range(1, self.depth + 1):
+            columns = ['account_category'] + [f"level_{level}" for level in range(1, depth + 1)]
+            present = self.levels[columns[-1]].notna().to_numpy()
+            keys = self.levels.loc[present, columns]
+            nodes = keys.drop_duplicates().sort_values(columns, ignore_index=True)
+            codes = pd.MultiIndex.from_frame(nodes).get_indexer(pd.MultiIndex.from_frame(keys))
+            rollup = np.zeros((prefix.shape[0], len(nodes)))
+            np.add.at(rollup.T, codes, prefix.T[present])
+            self._rollups[depth] = (nodes, rollup)
+
+            for path in nodes.itertuples(index=False, name=None):
+                self._children.setdefault(path[:-1], []).append(path[-1])
+
+        self._children[()] = sorted(self.levels['account_category'].unique())
+
+    def children(self, path=()):
+        """
+        Returns the names of a node's children; the root's children are the account categories.
+        """
+        return list(self._children.get(tuple(path), []))
+
+    def parent(self, path):
+        return tuple(path)[:-1]
+
+    def rollup(self, start=None, end=None, depth=1, category=None):
+        """
+        Returns the nodes at `depth` with their total balance over the period range, ordered by path.
+        The `name` column holds each node's own level name. Accounts with fewer levels than `depth`
+        are left out, and `depth` is capped at the hierarchy's depth. Restricted to one account
+        category (matched case-insensitively) if given.
+        """
+        if self.depth == 0:
+            return pd.DataFrame({'account_category': [], 'name': [], 'balance': []})
+        nodes, prefix = self._rollups[max(1, min(depth, self.depth))]
+        lo, hi = self.cube.period_slice(start, end)
+        rolled = nodes.assign(name=nodes.iloc[:, -1], balance=prefix[hi] - prefix[lo])
+        if category is not None:
+            rolled = rolled[rolled['account_category'].str.lower() == category.lower()].reset_index(drop=True)
+        return rolled
+
+    def total(self, path, start=None, end=None):
+        """
+        Returns the total balance of the node at `path` over the period range.
+        """
+        path = tuple(path)
+        if len(path) == 1:
+            return self.cube.total(start, end, category=path[0])
+        if len(path) - 1 > self.depth:
+            return 0.0
+        rolled = self.rollup(start, end, depth=len(path) - 1)
+        match = (rolled.iloc[:, :len(path)] == pd.Series(path, index=rolled.columns[:len(path)])).all(axis=1)
+        return float(rolled.loc[match, 'balance'].sum())
+
+
+def hierarchy_for(data):
+    """
+    Returns the AccountHierarchy for a loaded frame, building it on first use.
+    """
+    return derived(data, 'account_hierarchy', lambda: AccountHierarchy(cube_for(data)))
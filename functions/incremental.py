@@ -0,0 +1,132 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from functions.cache import get_result_cache
+from functions.normalise import period_key
+
+# ResultKey variant the watermarks are cached under
+INCREMENTAL_VARIANT = "incremental"
+
+# Number of most recent periods that are always fetched again, since open periods keep changing
+DEFAULT_RECENT_PERIODS = 2
+
+
+class IncrementalStore:
+    """
+    Process-wide record of the per-period source watermarks of already-fetched reports.
+
+    Closed periods are kept locally so a refresh only asks the warehouse for the most recent
+    periods and any period whose source watermark has moved since the last fetch. The rows of
+    the kept periods are taken from the report's own cached frame, so no second copy of it is held.
+
+    Watermarks map each accounting_period_ending to a (row_count, amount) pair. They live in the
+    result cache under the report's ResultKey with the "incremental" variant, so they are dropped
+    by the same invalidations (e.g. Refresh Data). They do not expire with its TTL, since they
+    are what a refresh of an expired result builds on.
+    """
+
+    def __init__(self, cache, recent_periods=DEFAULT_RECENT_PERIODS):
+        self.cache = cache
+        self.recent_periods = recent_periods
+
+    def get(self, key):
+        """
+        Returns the watermarks the cached frame of `key` was built from, or None.
+        """
+        entry = self.cache.peek(_watermarks_key(key))
+        return entry.value if entry is not None else None
+
+    def put(self, key, watermarks):
+        self.cache.put(_watermarks_key(key), watermarks)
+
+    def invalidate(self, predicate=None):
+        return self.cache.invalidate(
+            lambda key: key.variant == INCREMENTAL_VARIANT and (predicate is None or predicate(key._replace(variant=None)))
+        )
+
+    def stale_periods(self, previous, watermarks):
+        """
+        Returns the periods that must be fetched again: new or moved periods plus the most recent ones.
+        """
+        recent = sorted(watermarks, reverse=True)[:self.recent_periods]
+        moved = [period for period, mark in watermarks.items() if previous.get(period) != mark]
+        return sorted(set(recent) | set(moved))
+
+    def load(self, key, fetch_watermarks, fetch_periods, sort_column=None):
+        """
+        Returns the full report frame for `key`, fetching only what changed since the last load.
+
+        `fetch_watermarks()` returns a frame of accounting_period_ending, row_count and amount per period.
+        `fetch_periods(periods)` returns the report rows for the given periods, or for all periods if None.
+        Kept periods come from the normalised frame cached under `key`, so the merged frame mixes
+        normalised and raw rows and must be normalised again by the caller.
+        """
+        watermarks = watermark_dict(fetch_watermarks())
+        previous = self.get(key)
+        cached = self.cache.peek(key) if previous is not None else None
+
+        if cached is None:
+            # Without the frame the watermarks describe, every period is fetched again
+            frame = fetch_periods(None)
+        else:
+            stale = self.stale_periods(previous, watermarks)
+            kept_periods = set(watermarks) - set(stale)
+            # Compared as period keys, since the cached frame holds datetime64 endings
+            kept = cached.value[np.isin(
+                period_key(cached.value['accounting_period_ending']), period_key(sorted(kept_periods))
+            )]
+
+            if not stale and len(kept) == len(cached.value):
+                frame = cached.value
+            else:
+                delta = fetch_periods(stale) if stale else kept.iloc[0:0]
+                frame = pd.concat([kept, delta], ignore_index=True)
+                if sort_column is not None and sort_column in frame.columns:
+                    frame = frame.sort_values(sort_column, kind='stable', ignore_index=True)
+
+        self.put(key, watermarks)
+        return frame
+
+
+def _watermarks_key(key):
+    return key._replace(variant=INCREMENTAL_VARIANT)
+
+
+def watermark_dict(watermarks):
+    """
+    Converts a watermark frame into a {accounting_period_ending: (row_count, amount)} mapping.
+    """
+    return {
+        period: (int(row_count), round(float(amount), 2))
+        for period, row_count, amount in zip(
+            watermarks['accounting_period_ending'], watermarks['row_count'], watermarks['amount']
+        )
+    }
+
+
+def incremental_fetch_enabled():
+    return os.environ.get("INCREMENTAL_FETCH", "false").lower() in ("1", "true", "yes")
+
+
+_incremental_store = None
+_incremental_store_lock = threading.Lock()
+
+
+def get_incremental_store():
+    """
+    Returns the process-wide IncrementalStore, creating it on first use.
+    Watermarks are held in the process-wide result cache; the number of always-refreshed
+    periods is read from INCREMENTAL_RECENT_PERIODS.
+    """
+    global _incremental_store
+    if _incremental_store is None:
+        with _incremental_store_lock:
+            if _incremental_store is None:
+                _incremental_store = IncrementalStore(
+                    get_result_cache(),
+                    recent_periods=int(os.environ.get("INCREMENTAL_RECENT_PERIODS", DEFAULT_RECENT_PERIODS))
+                )
+    return _incremental_store
@@ -0,0 +1,178 @@
+import os
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_SAMPLES_PER_STAGE = 1000
+
+# One timed execution of a pipeline stage. `cache` is "hit", "miss" or None when not applicable.
+StageSample = namedtuple("StageSample", ["stage", "seconds", "rows", "nbytes", "cache", "timestamp", "labels"])
+
+
+def stage_log_enabled():
+    return os.environ.get("STAGE_LOG", "false").lower() in ("1", "true", "yes")
+
+
+class StageRecorder:
+    """
+    Process-wide record of pipeline stage timings.
+
+    The most recent `max_samples` samples of each stage are kept for percentiles, alongside
+    running totals of time, rows, bytes and cache hits. Recording is a lock and an append,
+    so it is cheap enough for hot paths and safe from worker threads.
+    """
+
+    def __init__(self, max_samples=DEFAULT_SAMPLES_PER_STAGE, log=False):
+        self.max_samples = max_samples
+        self.log = log
+        self._samples = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, rows=None, nbytes=None, cache=None, **labels):
+        sample = StageSample(stage, seconds, rows, nbytes, cache, time.time(), labels)
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.max_samples)).append(sample)
+            totals = self._totals.setdefault(stage, {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "hit": 0, "miss": 0})
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["rows"] += rows or 0
+            totals["bytes"] += nbytes or 0
+            if cache in ("hit", "miss"):
+                totals[cache] += 1
+        if self.log:
+            logger.info(json.dumps(sample_dict(sample), default=str))
+
+    def summary(self):
+        """
+        Returns one dict per stage with its count, p50/p95 wall time in ms, rows, bytes and cache hit ratio.
+        """
+        with self._lock:
+            stages = {stage: (list(samples), dict(self._totals[stage])) for stage, samples in self._samples.items()}
+
+        summary = []
+        for stage, (samples, totals) in sorted(stages.items()):
+            seconds = np.array([sample.seconds for sample in samples])
+            lookups = totals["hit"] + totals["miss"]
+            summary.append({
+                "stage": stage,
+                "count": totals["count"],
+                "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 2),
+                "p95_ms": round(float(np.percentile(seconds, 95)) * 1000, 2),
+                "total_s": round(totals["seconds"], 3),
+                "rows": totals["rows"],
+                "bytes": totals["bytes"],
+                "cache_hit_ratio": round(totals["hit"] / lookups, 3) if lookups else None,
+            })
+        return summary
+
+    def samples(self):
+        with self._lock:
+            return sorted((sample for samples in self._samples.values() for sample in samples), key=lambda sample: sample.timestamp)
+
+    def prometheus_text(self):
+        """
+        Returns the stage metrics in the Prometheus text exposition format.
+        Quantiles are computed over the retained samples, counters over the process lifetime.
+        """
+        lines = [
+            "# HELP netsuite_stage_seconds Wall time of report pipeline stages.",
+            "# TYPE netsuite_stage_seconds summary",
+        ]
+        with self._lock:
+            stages = {stage: (list(samples), dict(self._totals[stage])) for stage, samples in self._samples.items()}
+        for stage, (samples, totals) in sorted(stages.items()):
+            seconds = np.array([sample.seconds for sample in samples])
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'netsuite_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {np.percentile(seconds, quantile * 100):.6f}')
+            lines.append(f'netsuite_stage_seconds_sum{{stage="{stage}"}} {totals["seconds"]:.6f}')
+            lines.append(f'netsuite_stage_seconds_count{{stage="{stage}"}} {totals["count"]}')
+
+        for name, field, help_text in (
+            ("netsuite_stage_rows_total", "rows", "Rows handled by report pipeline stages."),
+            ("netsuite_stage_bytes_total", "bytes", "Bytes handled by report pipeline stages."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{stage="{stage}"}} {totals[field]}' for stage, (_, totals) in sorted(stages.items())]
+
+        lines += ["# HELP netsuite_stage_cache_total Cache lookups of report pipeline stages.", "# TYPE netsuite_stage_cache_total counter"]
+        for stage, (_, totals) in sorted(stages.items()):
+            if totals["hit"] or totals["miss"]:
+                lines.append(f'netsuite_stage_cache_total{{stage="{stage}",result="hit"}} {totals["hit"]}')
+                lines.append(f'netsuite_stage_cache_total{{stage="{stage}",result="miss"}} {totals["miss"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+def sample_dict(sample):
+    """
+    Converts a StageSample into a flat dict, as written to the structured log.
+    """
+    record = {
+        "stage": sample.stage,
+        "ms": round(sample.seconds * 1000, 3),
+        "rows": sample.rows,
+        "bytes": sample.nbytes,
+        "cache": sample.cache,
+        "timestamp": sample.timestamp,
+    }
+    record.update(sample.labels)
+    return record
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_stage_recorder():
+    """
+    Returns the process-wide StageRecorder, creating it on first use.
+    Samples are also written to the log as JSON lines when STAGE_LOG is enabled.
+    """
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = StageRecorder(
+                    max_samples=int(os.environ.get("STAGE_SAMPLES", DEFAULT_SAMPLES_PER_STAGE)),
+                    log=stage_log_enabled(),
+                )
+    return _recorder
+
+
+def frame_stats(frame):
+    """
+    Returns the `rows` and `nbytes` fields of a sample for a frame. Object columns are counted
+    by their pointers only, which keeps the measurement cheap on large frames.
+    """
+    return {"rows": len(frame), "nbytes": int(frame.memory_usage(index=False, deep=False).sum())}
+
+
+def record_stage(stage, seconds, rows=None, nbytes=None, cache=None, **labels):
+    get_stage_recorder().record(stage, seconds, rows=rows, nbytes=nbytes, cache=cache, **labels)
+
+
+@contextmanager
+def timed_stage(stage, **labels):
+    """
+    Times the enclosed block as `stage`. The yielded dict can be filled with `rows`, `nbytes`
+    and `cache` while the block runs; the sample is recorded even if the block raises.
+    """
+    fields = {}
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record_stage(stage, time.perf_counter() - started, **fields, **labels)
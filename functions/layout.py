@@ -0,0 +1,199 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from functions.cache import derived
+from functions.cube import cube_for
+from functions.normalise import period_dates
+
+# Nested report structure: periods contain categories, categories contain account types
+PeriodLayout = namedtuple("PeriodLayout", ["ending", "name", "categories"])
+CategorySection = namedtuple("CategorySection", ["name", "total", "formatted_total", "account_types"])
+AccountTypeSection = namedtuple("AccountTypeSection", ["name", "total", "formatted_total", "accounts"])
+
+SECTION_COLUMNS = ['account_category', 'account_type_name']
+
+
+def format_currency(values):
+    """
+    Formats balances as "$1,234.56" strings (negatives as "$-1,234.56", NaN as "$nan").
+    Callers format only what is displayed, e.g. the visible page of an account table.
+    """
+    return np.array(["${:,.2f}".format(value) for value in np.asarray(values, dtype=float)], dtype=object)
+
+
+def _sections(keys, totals, los, his, category_totals, accounts):
+    """
+    Assembles the category and account type sections for one group of rows from its
+    (category, account type) keys, their totals and their row bounds into `accounts`.
+    """
+    categories = {}
+    for (category, account_type), total, lo, hi in zip(keys, totals, los, his):
+        section = AccountTypeSection(account_type, total, "${:,.2f}".format(total), accounts.iloc[lo:hi])
+        categories.setdefault(category, []).append(section)
+    return [
+        CategorySection(category, category_totals[category], "${:,.2f}".format(category_totals[category]), account_types)
+        for category, account_types in categories.items()
+    ]
+
+
+def _grouped_accounts(frame, columns):
+    """
+    Groups rows by `columns` in order of first appearance and returns (keys, totals, accounts, bounds):
+    the group keys and balance totals, the account rows reordered so every group is contiguous
+    (keeping row order within a group) and the row bounds of group i as bounds[i]:bounds[i + 1].
+    Sections are then slices of one frame rather than one take per section.
+    """
+    grouped = frame.groupby(columns, sort=False, observed=True)
+    # Rows with a missing key belong to no group (ngroup gives NaN or -1) and are left out, as in the totals
+    codes = np.nan_to_num(grouped.ngroup().to_numpy(dtype=float), nan=-1).astype(np.int64)
+    totals = grouped['balance'].sum()
+    grouped_rows = np.flatnonzero(codes >= 0)
+    order = grouped_rows[np.argsort(codes[grouped_rows], kind='stable')]
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[grouped_rows], minlength=len(totals)))])
+    accounts = frame[['account_name', 'balance']].iloc[order].reset_index(drop=True)
+    return list(totals.index), totals.to_numpy(), accounts, bounds
+
+
+def statement_layout(data):
+    """
+    Groups report rows into categories and account types with their subtotals in a single pass.
+
+    Returns a list of CategorySection in the order the categories first appear in `data`.
+    Account rows hold `account_name` and the numeric `balance`.
+    """
+    frame = _prepare(data)
+    keys, totals, accounts, bounds = _grouped_accounts(frame, SECTION_COLUMNS)
+    category_totals = frame.groupby('account_category', sort=False, observed=True)['balance'].sum()
+    return _sections(keys, totals, bounds[:-1], bounds[1:], dict(zip(category_totals.index, category_totals.to_numpy())), accounts)
+
+
+def period_layouts(data):
+    """
+    Groups report rows into one statement layout per period, latest period first,
+    computing every period's category and account type subtotals in a single pass.
+    """
+    frame = _prepare(data)
+    keys, totals, accounts, bounds = _grouped_accounts(frame, ['accounting_period_ending'] + SECTION_COLUMNS)
+    periods = frame[['accounting_period_ending', 'accounting_period_name']].drop_duplicates('accounting_period_ending')
+    period_names = dict(zip(periods['accounting_period_ending'], periods['accounting_period_name']))
+
+    category_totals = {}
+    grouped = frame.groupby(['accounting_period_ending', 'account_category'], sort=False, observed=True)['balance'].sum()
+    for (ending, category), total in zip(grouped.index, grouped.to_numpy()):
+        category_totals.setdefault(ending, {})[category] = total
+
+    # Positions of each period's groups, in the order the groups first appear
+    groups = {}
+    for position, key in enumerate(keys):
+        groups.setdefault(key[0], []).append(position)
+
+    layouts = []
+    endings = sorted(groups, reverse=True)
+    for ending, date in zip(endings, period_dates(endings)):
+        positions = np.array(groups[ending])
+        layouts.append(PeriodLayout(
+            date,
+            period_names[ending],
+            _sections(
+                [keys[position][1:] for position in positions], totals[positions],
+                bounds[positions], bounds[positions + 1], category_totals[ending], accounts,
+            ),
+        ))
+    return layouts
+
+
+# Baselines the comparative view can measure variance against
+COMPARE_AGAINST = {
+    'previous': "Previous period",
+    'first': "First period in range",
+}
+
+
+# Values of the comparative table's Level column, marking account rows and subtotal rows
+COMPARATIVE_LEVELS = {
+    'account': "Account",
+    'account_type': "Account type subtotal",
+    'category': "Category total",
+}
+
+
+def comparative_table(data, start, end, against='previous', exclude_categories=()):
+    """
+    Returns a wide comparative statement for the periods ending between `start` and `end`:
+    one row per account with account type and category subtotal rows (told apart by the Level
+    column, see COMPARATIVE_LEVELS), one formatted column per
+    period (oldest first), and the variance and % change of the latest period against the
+    previous period or the first period of the range.
+
+    Computed from the frame's cube and cached per frame and range.
+    """
+    key = ('comparative', start, end, against, tuple(exclude_categories))
+    return derived(data, key, lambda: _comparative_table(cube_for(data), start, end, against, exclude_categories))
+
+
+def _comparative_table(cube, start, end, against, exclude_categories):
+    lo, hi = cube.period_slice(start, end)
+    periods = cube.period_names[lo:hi]
+    excluded = {category.lower() for category in exclude_categories}
+
+    # Account rows, then one subtotal row per account type and per category; the sort keys
+    # place each subtotal after the rows it totals
+    parts = []
+    category_members, _ = cube._levels['category']
+    category_order = {name: order for order, name in enumerate(category_members['account_category'])}
+    type_members, _ = cube._levels['account_type']
+    type_order = {tuple(row): order for order, row in enumerate(type_members.itertuples(index=False))}
+    last = np.iinfo(np.int64).max
+
+    for level in ('account', 'account_type', 'category'):
+        members, balances = cube.period_matrix(start, end, level)
+        members = members.astype(object).reset_index(drop=True)
+        keep = ~members['account_category'].astype(str).str.lower().isin(excluded).to_numpy()
+        if level == 'account':
+            # Accounts without any balance in the range are left out
+            keep &= np.abs(balances).sum(axis=1) > 0
+        members, balances = members[keep].reset_index(drop=True), balances[keep]
+
+        # Account type subtotals and category totals get distinct labels, since an account type
+        # can share its category's name (e.g. "Equity")
+        rows = pd.DataFrame({
+            'Level': COMPARATIVE_LEVELS[level],
+            'Category': members['account_category'],
+            'Account Type': members['account_type_name'] if level != 'category' else "",
+            'Account': members['account_name'] if level == 'account' else (
+                "Subtotal " + members['account_type_name'].astype(str) if level == 'account_type'
+                else "Total " + members['account_category'].astype(str)
+            ),
+        })
+        rows['_category'] = members['account_category'].map(category_order).to_numpy()
+        rows['_type'] = last if level == 'category' else [
+            type_order[key] for key in zip(members['account_category'], members['account_type_name'])
+        ]
+        rows['_row'] = np.arange(len(rows)) if level == 'account' else last
+        parts.append((rows, balances))
+
+    rows = pd.concat([rows for rows, _ in parts], ignore_index=True)
+    balances = np.vstack([balances for _, balances in parts]) if parts else np.zeros((0, len(periods)))
+    order = np.lexsort((rows['_row'].to_numpy(), rows['_type'].to_numpy(), rows['_category'].to_numpy()))
+    rows, balances = rows.iloc[order].drop(columns=['_category', '_type', '_row']).reset_index(drop=True), balances[order]
+
+    for position, name in enumerate(periods):
+        rows[name] = format_currency(balances[:, position])
+
+    if len(periods) > 1:
+        latest = balances[:, -1]
+        base = balances[:, -2] if against == 'previous' else balances[:, 0]
+        variance = latest - base
+        change = np.divide(variance, np.abs(base), out=np.full(len(base), np.nan), where=base != 0)
+        rows['Variance'] = format_currency(variance)
+        rows['% Change'] = np.where(np.isnan(change), "n/a", pd.Series(change * 100).round(1).astype(str) + "%")
+    return rows
+
+
+def _prepare(data):
+    # Only the columns the layouts read, so reordering the rows stays cheap on wide frames
+    columns = ['accounting_period_ending', 'accounting_period_name'] + SECTION_COLUMNS + ['account_name']
+    frame = data[[column for column in columns if column in data.columns]].reset_index(drop=True)
+    return frame.assign(balance=data['balance'].astype(float).to_numpy())
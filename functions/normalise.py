@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Dimension columns stored as categoricals
+CATEGORICAL_COLUMNS = [
+    'accounting_period_name',
+    'account_category',
+    'account_name',
+    'account_type_name',
+]
+
+# Dimension columns that also get a lowercased categorical copy named "<column>_lower"
+LOWERED_COLUMNS = [
+    'account_category',
+    'account_name',
+    'account_type_name',
+]
+
+
+def period_key(endings):
+    """
+    Converts period ending dates to int32 keys of the form YYYYMMDD.
+    Accepts a single date or an array-like of dates.
+    """
+    if hasattr(endings, 'year') and not hasattr(endings, '__len__'):
+        return np.int32(endings.year * 10000 + endings.month * 100 + endings.day)
+    endings = pd.Series(endings)
+    if not pd.api.types.is_datetime64_any_dtype(endings):
+        endings = pd.to_datetime(endings)
+    keys = endings.dt.year * 10000 + endings.dt.month * 100 + endings.dt.day
+    return keys.fillna(0).to_numpy(dtype=np.int32)
+
+
+def period_endings(endings):
+    """
+    Converts period endings (dates, timestamps or date strings) to datetime64[s] values.
+    Each distinct ending is parsed once, so the cost does not grow with the number of rows.
+    """
+    endings = pd.Series(endings)
+    if not pd.api.types.is_datetime64_any_dtype(endings):
+        codes, uniques = pd.factorize(endings)
+        parsed = pd.to_datetime(pd.Series(uniques, dtype=object))
+        endings = pd.Series(parsed.to_numpy()[codes] if len(uniques) else np.empty(0, dtype='datetime64[s]'), index=endings.index)
+        endings[codes < 0] = pd.NaT
+    if endings.dt.tz is not None:
+        endings = endings.dt.tz_localize(None)
+    return endings.astype('datetime64[s]')
+
+
+def period_dates(endings):
+    """
+    Returns period endings as a list of datetime.date, whether they are held as datetime64 values or as dates.
+    """
+    endings = pd.Series(endings)
+    if pd.api.types.is_datetime64_any_dtype(endings):
+        return list(endings.dt.date)
+    return list(endings)
+
+
+def _lowered(column):
+    """
+    Lowercases a categorical column by lowercasing its categories only, not every row.
+    """
+    lowered = column.cat.categories.str.lower()
+    categories, inverse = np.unique(np.asarray(lowered, dtype=object), return_inverse=True)
+    codes = column.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(codes >= 0, inverse[codes], -1), categories)
+
+
+def _chronological(names, endings):
+    """
+    Orders the categories of the period name column by their period ending rather than alphabetically,
+    so "Apr 2023" sorts after "Mar 2023". Names without an ending sort last.
+    """
+    codes = names.cat.codes.to_numpy()
+    values = endings.to_numpy().view(np.int64)
+    valid = (codes >= 0) & ~np.isnat(endings.to_numpy())
+    first = np.full(len(names.cat.categories), np.iinfo(np.int64).max)
+    np.minimum.at(first, codes[valid], values[valid])
+    return names.cat.reorder_categories(names.cat.categories[np.argsort(first, kind='stable')])
+
+
+def normalise_frame(frame):
+    """
+    Converts a loaded report frame to its compact schema.
+
+    - Dimension columns become categoricals, with lowercased copies for case-insensitive matching
+    - `accounting_period_name` categories are in chronological order, also after merging frames
+    - `accounting_period_ending` becomes datetime64[s] instead of an object column of dates
+    - `period_key` holds the period ending as an int32 YYYYMMDD key for integer comparisons
+    - `balance` becomes float64
+
+    Columns that are not present are skipped, so period lists are normalised too.
+    """
+    columns = {}
+    for column in CATEGORICAL_COLUMNS:
+        if column in frame.columns:
+            columns[column] = frame[column].astype('category')
+    for column in LOWERED_COLUMNS:
+        if column in columns:
+            columns[column + '_lower'] = _lowered(columns[column])
+    if 'accounting_period_ending' in frame.columns:
+        columns['accounting_period_ending'] = period_endings(frame['accounting_period_ending'])
+        columns['period_key'] = period_key(columns['accounting_period_ending'])
+        if 'accounting_period_name' in columns:
+            columns['accounting_period_name'] = _chronological(columns['accounting_period_name'], columns['accounting_period_ending'])
+    if 'balance' in frame.columns:
+        columns['balance'] = frame['balance'].astype(np.float64)
+    return frame.assign(**columns)
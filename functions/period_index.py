@@ -0,0 +1,79 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from functions.cache import derived
+from functions.normalise import period_dates, period_key
+
+
+class PeriodIndex:
+    """
+    Sorted accounting periods of a frame with name ↔ ending lookups.
+
+    Built once per frame. Period endings are held in ascending order for range lookups with
+    bisect, and when the frame carries `period_key` the row positions are held grouped by
+    period so a range of periods maps to a slice of positions instead of a scan of every row.
+    """
+
+    def __init__(self, data):
+        periods = data[['accounting_period_ending', 'accounting_period_name']]
+        periods = periods[periods['accounting_period_ending'].notna()].drop_duplicates('accounting_period_ending')
+        periods = periods.sort_values('accounting_period_ending')
+        self.endings = period_dates(periods['accounting_period_ending'])
+        self.names = [str(name) for name in periods['accounting_period_name']]
+        self.keys = period_key(self.endings) if self.endings else np.empty(0, dtype=np.int32)
+
+        self._name_for = dict(zip(self.endings, self.names))
+        # Latest period wins if a name is used by more than one period
+        self._ending_for = {}
+        for ending, name in zip(reversed(self.endings), reversed(self.names)):
+            self._ending_for.setdefault(name, ending)
+
+        # Row positions ordered by period, keeping the frame's order within each period
+        self._order = None
+        if 'period_key' in data.columns:
+            row_keys = data['period_key'].to_numpy()
+            self._order = np.argsort(row_keys, kind='stable')
+            self._row_keys = row_keys[self._order]
+
+    def __len__(self):
+        return len(self.endings)
+
+    def names_descending(self):
+        """
+        Returns the period names, latest period first.
+        """
+        return self.names[::-1]
+
+    def latest(self):
+        return self.endings[-1] if self.endings else None
+
+    def name_for(self, ending):
+        return self._name_for.get(ending)
+
+    def ending_for(self, name):
+        return self._ending_for.get(name)
+
+    def period_slice(self, start=None, end=None):
+        """
+        Returns the (lo, hi) bounds into `endings` covering periods ending between `start` and `end` inclusive.
+        """
+        lo = 0 if start is None else bisect_left(self.endings, start)
+        hi = len(self.endings) if end is None else bisect_right(self.endings, end)
+        return lo, max(lo, hi)
+
+    def positions(self, start=None, end=None):
+        """
+        Returns the row positions of periods ending between `start` and `end` inclusive, in frame order.
+        Requires the frame to carry `period_key`.
+        """
+        lo = 0 if start is None else np.searchsorted(self._row_keys, period_key(start), side='left')
+        hi = len(self._row_keys) if end is None else np.searchsorted(self._row_keys, period_key(end), side='right')
+        return np.sort(self._order[lo:max(lo, hi)])
+
+
+def period_index_for(data):
+    """
+    Returns the PeriodIndex for a frame, building it on first use.
+    """
+    return derived(data, 'period_index', lambda: PeriodIndex(data))
@@ -1,30 +1,75 @@
+import os
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 from google.oauth2 import service_account
 from google.cloud import bigquery
 import datetime
-from functions.env_utils import setup_snowflake_connection
+from functions.env_utils import ACCOUNTING_BOOKS, snowflake_connection_params, verify_snowflake_credentials, credentials_verified
+from functions.arrow_fetch import arrow_fetch_enabled, frame_from_arrow
+from functions.cache import derived, get_result_cache, ResultKey
+from functions.connection_pool import get_connection_pool
+from functions.incremental import get_incremental_store, incremental_fetch_enabled
+from functions.instrumentation import frame_stats, timed_stage
+from functions.normalise import normalise_frame
+from functions.refresh import get_refresh_scheduler
+from functions.single_flight import get_warehouse_flight, normalise_sql
+from functions.snapshot import get_snapshot_store, read_frame, write_frame
+from functions.query_builder import REPORT_TABLES, SORT_HELPERS, books_report_statement, report_statement, periods_statement, watermark_statement
 
-# Grab global variables
-destination = st.session_state.destination
-database = st.session_state.database 
-schema = st.session_state.schema
+logger = logging.getLogger(__name__)
+
+# Bundled sample data CSVs, converted to Feather files next to them on first read
+SAMPLE_DATA = {
+    'bs': 'data/dunder_mifflin_balance_sheet',
+    'is': 'data/dunder_mifflin_income_statement',
+}
 
 # Perform query.
-# Uses st.cache_data to only rerun when the query changes or after 10 min.
-@st.cache_data(ttl=600)
-def run_query(query):
+# Not cached here: results are cached, expired and refreshed by the process-wide ResultCache,
+# so a second cache layer would hand back old rows to refreshes and "Refresh Data".
+def run_query(query, params=(), arrow=False):
     # Create API client.
     credentials = service_account.Credentials.from_service_account_info(
         st.secrets["gcp_service_account"]
     )
     client = bigquery.Client(credentials=credentials)
-    query_job = client.query(query)
+    # Bind parameters are passed as a tuple of (name, value) pairs so they stay hashable
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[_bigquery_parameter(name, value) for name, value in params]
+    )
+    query_job = client.query(query, job_config=job_config)
+    if arrow:
+        # Read the result as Arrow, through the BigQuery Storage Read API when it is installed
+        return frame_from_arrow(query_job.to_arrow(create_bqstorage_client=True))
     rows_raw = query_job.result()
-    # Convert to list of dicts. Required for st.cache_data to hash the return value.
+    # Convert to list of dicts for the DataFrame constructor
     rows = [dict(row) for row in rows_raw]
     return rows
 
+def _bigquery_parameter(name, value):
+    if isinstance(value, tuple):
+        element_type = _bigquery_type(value[0]) if value else "STRING"
+        return bigquery.ArrayQueryParameter(name, element_type, list(value))
+    return bigquery.ScalarQueryParameter(name, _bigquery_type(value), value)
+
+def _bigquery_type(value):
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, datetime.datetime):
+        return "TIMESTAMP"
+    if isinstance(value, datetime.date):
+        return "DATE"
+    return "STRING"
+
 def convert_date_string(date_str):
     """
     Converts a string date like '2023-10-31' to a datetime object.
@@ -47,158 +92,494 @@ def convert_date_string(date_str):
         # Return as is if it's already a datetime
         return date_str
 
-def query_results(destination, database, schema, model='bs'):
-    # No caching at this level - rely on the connection's caching mechanism
-
-    if destination == "BigQuery" and model == "bs":
-        if database is None or schema is None:
-            st.warning("Results will be displayed once your database and schema are provided.")
-        else:
-            # Get the accounting book ID from session state
-            accounting_book_id = st.session_state.get('accounting_book', 1)
-            
-            query = run_query(
-                "select "\
-                    "balance_sheet_sort_helper, "\
-                    "accounting_period_name, "\
-                    "accounting_period_ending, "\
-                    "account_category, "\
-                    "account_name, "\
-                    "account_type_name, "\
-                    "round(sum(transaction_amount),2) as balance "\
-                "from `" + database + "." + schema + ".netsuite2__balance_sheet` "\
-                "where accounting_book_id = " + str(accounting_book_id) + " "\
-                "group by 1,2,3,4,5,6 order by balance_sheet_sort_helper"
-            )
-
-    if destination == "BigQuery" and model == "is":
-        if database is None or schema is None:
-            st.error("Results will be displayed once your database and schema are provided.")
-        else:
-            query = run_query(
-                "select "\
-                    "income_statement_sort_helper, "\
-                    "accounting_period_name, "\
-                    "accounting_period_ending, "\
-                    "account_category, "\
-                    "account_name, "\
-                    "account_type_name, "\
-                    "round(sum(transaction_amount),2) as balance "\
-                "from `" + database + "." + schema + ".netsuite2__income_statement` "\
-                "group by 1,2,3,4,5,6 order by income_statement_sort_helper"
-            )
-
-    if destination == "Snowflake" and model == "bs":
-        if database is None or schema is None:
-            st.warning("Results will be displayed once your database and schema are provided.")
-        else:
-            # Get connection with current credentials
-            conn = setup_snowflake_connection()
-            
-            # Only proceed if we have a valid connection
-            if conn is not None:
-                # Get the accounting book ID from session state
-                accounting_book_id = st.session_state.get('accounting_book', 1)
-                
-                # Use ttl=0 to always fetch fresh data
-                dataframe_results = conn.query(
-                    "select "\
-                        "balance_sheet_sort_helper, "\
-                        "accounting_period_name, "\
-                        "accounting_period_ending, "\
-                        "account_category, "\
-                        "account_name, "\
-                        "account_type_name, "\
-                        "round(sum(transaction_amount),2) as balance "\
-                    "from " + database + "." + schema + ".netsuite2__balance_sheet "\
-                    "where accounting_book_id = " + str(accounting_book_id) + " "\
-                    "group by 1,2,3,4,5,6 order by balance_sheet_sort_helper",
-                    ttl=0  # Always fetch fresh data
-                )
-                
-                dataframe_results.columns = dataframe_results.columns.str.lower()
-                
-                # Handle date conversion properly
-                if 'accounting_period_ending' in dataframe_results.columns:
-                    dataframe_results['accounting_period_ending'] = convert_date_string(dataframe_results['accounting_period_ending'])
-                
-                query = dataframe_results
-            else:
-                # Return empty dataframe if no valid connection
-                st.error("Unable to connect to Snowflake. Please check your credentials.")
-                query = pd.DataFrame()
-
-    if destination == "Snowflake" and model == "is":
-        if database is None or schema is None:
-            st.warning("Results will be displayed once your database and schema are provided.")
-        else:
-            # Get connection with current credentials
-            conn = setup_snowflake_connection()
-            
-            # Only proceed if we have a valid connection
-            if conn is not None:
-                # Get the accounting book ID from session state
-                accounting_book_id = st.session_state.get('accounting_book', 1)
-                
-                # Use ttl=0 to always fetch fresh data
-                dataframe_results = conn.query(
-                    "select "\
-                        "income_statement_sort_helper, "\
-                        "accounting_period_name, "\
-                        "accounting_period_ending, "\
-                        "account_category, "\
-                        "account_name, "\
-                        "account_type_name, "\
-                        "round(sum(transaction_amount),2) as balance "\
-                    "from " + database + "." + schema + ".netsuite2__income_statement "\
-                    "where accounting_book_id = " + str(accounting_book_id) + " "\
-                    "group by 1,2,3,4,5,6 order by income_statement_sort_helper",
-                    ttl=0  # Always fetch fresh data
-                )
+class WarehouseConnectionError(Exception):
+    """
+    Raised when a warehouse connection could not be opened for a load.
+    """
 
-                dataframe_results.columns = dataframe_results.columns.str.lower()
+# A prepared load: its result cache key, the function fetching it on a miss and an optional
+# transform applied to the cached frame. Plans are built in the script thread, where session
+# state is available, and can then be executed from worker threads.
+LoadPlan = namedtuple("LoadPlan", ["key", "loader", "transform"], defaults=(None,))
 
-                # Handle date conversion properly
-                if 'accounting_period_ending' in dataframe_results.columns:
-                    dataframe_results['accounting_period_ending'] = convert_date_string(dataframe_results['accounting_period_ending'])
+def _run_warehouse_query(destination, statement, connection_params=None):
+    """
+    Runs a built Statement against the warehouse and returns a frame with lowercased columns
+    and `accounting_period_ending` converted to dates.
 
-                query = dataframe_results
-            else:
-                # Return empty dataframe if no valid connection
-                st.error("Unable to connect to Snowflake. Please check your credentials.")
-                query = pd.DataFrame()
+    Identical statements running at the same time for the same account and role share one
+    warehouse query and its result frame, which must not be modified in place.
+    Raises WarehouseConnectionError if no Snowflake connection could be opened.
+    """
+    params = connection_params or {}
+    flight_key = (
+        destination, params.get('account'), params.get('role'),
+        normalise_sql(statement.sql), statement.params,
+    )
+    return get_warehouse_flight().do(flight_key, lambda: _execute_statement(destination, statement, connection_params))
 
-    if destination == "Dunder Mifflin Sample Data" and model == "is":
-        query = pd.read_csv('data/dunder_mifflin_income_statement.csv')
+def _execute_statement(destination, statement, connection_params):
+    if destination == "BigQuery":
+        with timed_stage("warehouse_query", destination=destination) as sample:
+            query = pd.DataFrame(run_query(statement.sql, statement.params, arrow=arrow_fetch_enabled()))
+            sample.update(frame_stats(query))
+    else:
+        if connection_params is None:
+            raise WarehouseConnectionError("Snowflake credentials are not provided.")
+        try:
+            conn = get_connection_pool().acquire(connection_params)
+        except Exception as e:
+            raise WarehouseConnectionError(f"Error connecting to Snowflake: {e}") from e
 
-        ## Convert csv fields for time conversions later on
-        query['accounting_period_ending'] = pd.to_datetime(query['accounting_period_ending'])
+        with conn, timed_stage("warehouse_query", destination=destination) as sample:
+            query = conn.query(statement.sql, statement.positional(), arrow=arrow_fetch_enabled())
+            sample.update(frame_stats(query))
 
-    if destination == "Dunder Mifflin Sample Data" and model == "bs":
-        query = pd.read_csv('data/dunder_mifflin_balance_sheet.csv')
+    query.columns = query.columns.astype(str).str.lower()
+    return _prepare_dates(query)
 
-        ## Convert csv fields for time conversions later on
-        query['accounting_period_ending'] = pd.to_datetime(query['accounting_period_ending'])
+def _holds_dates(column):
+    # Arrow fetches already deliver datetime.date values
+    first = column.iloc[0] if len(column) else None
+    return isinstance(first, datetime.date) and not isinstance(first, datetime.datetime)
 
+def _prepare_dates(query):
     # Safely convert date column regardless of its current type
-        if 'accounting_period_ending' in query.columns:
+    if 'accounting_period_ending' in query.columns and not _holds_dates(query['accounting_period_ending']):
+        with timed_stage("date_conversion", rows=len(query)):
             query['accounting_period_ending'] = convert_date_string(query['accounting_period_ending'])
             # Convert to date format if it's datetime
             if pd.api.types.is_datetime64_any_dtype(query['accounting_period_ending']):
                 query['accounting_period_ending'] = query['accounting_period_ending'].dt.date
-    
-    if model == 'bs':
-        data = query
-
-        # Get the data into the app and specify any datatypes if needed.
-        data_load_state = st.text('Loading data...')
-        data['accounting_period_ending'] = data['accounting_period_ending'].dt.date
-        data_load_state.text("Done! (using fresh data)")
-    if model == 'is':
-        data = query
-        # Get the data into the app and specify any datatypes if needed.
-        data_load_state = st.text('Loading data...')
-        data['accounting_period_ending'] = data['accounting_period_ending'].dt.date
-        data_load_state.text("Done! (using fresh data)")
-        
+    return query
+
+def _load_results(destination, database, schema, model, accounting_book_id, key=None, connection_params=None):
+    """
+    Fetches a report model from its source and prepares the date column.
+
+    With INCREMENTAL_FETCH enabled, warehouse loads only fetch the recent periods and any
+    period whose watermark moved, and merge them with the periods already held locally.
+    """
+    if destination == "Dunder Mifflin Sample Data" and model in SAMPLE_DATA:
+        return _load_sample(model)
+
+    if destination not in ("BigQuery", "Snowflake") or model not in REPORT_TABLES:
+        return pd.DataFrame()
+
+    def fetch(statement):
+        return _run_warehouse_query(destination, statement, connection_params)
+
+    if key is not None and multi_book_fetch_enabled() and not incremental_fetch_enabled():
+        return _load_books(destination, database, schema, model, key, fetch)
+
+    if key is None or not incremental_fetch_enabled():
+        return fetch(report_statement(destination, database, schema, model, accounting_book_id))
+
+    return get_incremental_store().load(
+        key,
+        fetch_watermarks=lambda: fetch(watermark_statement(destination, database, schema, model, accounting_book_id)),
+        fetch_periods=lambda periods: fetch(report_statement(destination, database, schema, model, accounting_book_id, periods)),
+        sort_column=SORT_HELPERS[model],
+    )
+
+def _load_books(destination, database, schema, model, key, fetch):
+    """
+    Fetches every permitted accounting book of a model with one grouped query, caches each
+    other book under its own key and returns the rows of `key`'s book.
+    Requested books without any rows are cached as empty frames, so they are not fetched again.
+    """
+    book = int(key.accounting_book_id)
+    books = sorted(set(ACCOUNTING_BOOKS.values()) | {book})
+    data = fetch(books_report_statement(destination, database, schema, model, books))
+    if 'accounting_book_id' not in data.columns:
+        return data
+
+    # The fetched frame may be shared with other callers, so it is split without modifying it
+    frames = {
+        int(book_id): rows.drop(columns='accounting_book_id').reset_index(drop=True)
+        for book_id, rows in data.groupby('accounting_book_id', sort=False)
+    }
+    empty = data.iloc[0:0].drop(columns='accounting_book_id')
+    fetched_at = time.time()
+    for book_id, frame in frames.items():
+        if book_id != book:
+            _store(key._replace(accounting_book_id=book_id), normalise_frame(frame), fetched_at)
+    # _store skips empty frames, but an empty book is a complete answer from the grouped query
+    for book_id in books:
+        if book_id not in frames:
+            get_result_cache().put(key._replace(accounting_book_id=book_id), normalise_frame(empty), fetched_at=fetched_at)
+    return frames.get(book, empty)
+
+def multi_book_fetch_enabled():
+    return os.environ.get("MULTI_BOOK_FETCH", "false").lower() in ("1", "true", "yes")
+
+def _load_sample(model):
+    """
+    Reads a bundled sample model, preferring the memory-mapped Feather file over parsing the CSV.
+    The Feather file is (re)written from the CSV when it is missing or older than the CSV,
+    so it never drifts from the bundled data.
+    """
+    path = SAMPLE_DATA[model]
+    try:
+        if os.path.getmtime(path + '.feather') >= os.path.getmtime(path + '.csv'):
+            return read_frame(path + '.feather')
+    except OSError:
+        pass
+    data = _prepare_dates(pd.read_csv(path + '.csv'))
+    try:
+        write_frame(path + '.feather', data)
+    except OSError as e:
+        logger.warning("Could not write %s.feather: %s", path, e)
     return data
+
+def query_pushdown_enabled():
+    return os.environ.get("QUERY_PUSHDOWN", "false").lower() in ("1", "true", "yes")
+
+def _result_key(destination, database, schema, model, variant=None):
+    # Get the accounting book ID and role from session state
+    accounting_book_id = st.session_state.get('accounting_book', 1)
+    role = (st.session_state.get('snowflake_role') or None) if destination == "Snowflake" else None
+    return ResultKey(destination, database, schema, model, accounting_book_id, role, variant)
+
+def _connection_params(destination):
+    return snowflake_connection_params() if destination == "Snowflake" else None
+
+def _missing_location(destination, database, schema):
+    return destination in ("BigQuery", "Snowflake") and (database is None or schema is None)
+
+def _distinct_periods(data):
+    if data.empty:
+        return data
+    # Derived once per cached frame so the period list keeps its identity across reruns
+    return derived(data, 'distinct_periods', lambda: data[['accounting_period_name', 'accounting_period_ending']].drop_duplicates())
+
+def _plan_results(destination, database, schema, model):
+    return _report_plan(_result_key(destination, database, schema, model), _connection_params(destination))
+
+def _report_plan(key, connection_params):
+    return LoadPlan(key, lambda: _load_results(
+        key.destination, key.database, key.schema, key.model, key.accounting_book_id, key=key, connection_params=connection_params
+    ))
+
+def _plan_periods(destination, database, schema, model):
+    if destination not in ("BigQuery", "Snowflake") or not query_pushdown_enabled():
+        return _plan_results(destination, database, schema, model)._replace(transform=_distinct_periods)
+
+    key = _result_key(destination, database, schema, model, variant="periods")
+    params = _connection_params(destination)
+    statement = periods_statement(destination, database, schema, model, key.accounting_book_id)
+    return LoadPlan(key, lambda: _run_warehouse_query(destination, statement, params))
+
+def _plan_range(destination, database, schema, model, start, end, categories=None, columns=None):
+    if destination not in ("BigQuery", "Snowflake") or not query_pushdown_enabled():
+        return _plan_results(destination, database, schema, model)
+
+    key = _result_key(destination, database, schema, model)
+    params = _connection_params(destination)
+    statement = report_statement(
+        destination, database, schema, model, key.accounting_book_id,
+        start=start, end=end, categories=categories, columns=columns,
+    )
+    # The statement text and bind values identify the range query in the result cache
+    key = key._replace(variant=statement.cache_key())
+    return LoadPlan(key, lambda: _run_warehouse_query(destination, statement, params))
+
+def _fetch(plan):
+    """
+    Returns (frame, fetched_at, from_cache, refreshing) for a plan, running its loader on a cache miss.
+
+    Expired results are served as they are while a background refresh replaces them
+    (stale-while-revalidate), unless they were fetched longer ago than the scheduler's maximum
+    staleness; those are loaded again before returning, so a failing load raises instead of
+    serving old data indefinitely. Concurrent misses for the same key share one load.
+    Does not touch Streamlit, so it is safe to call from worker threads.
+    """
+    cache = get_result_cache()
+    scheduler = _get_scheduler()
+    scheduler.register(plan)
+
+    with timed_stage("result_fetch", model=plan.key.model) as sample:
+        entry = cache.peek(plan.key, count=True)
+        if entry is not None and not scheduler.too_stale(entry.fetched_at):
+            sample.update(cache="hit", rows=len(entry.value), nbytes=entry.nbytes)
+            if cache.expired(entry):
+                scheduler.refresh(plan)
+                return entry.value, entry.fetched_at, True, True
+            return entry.value, entry.fetched_at, True, scheduler.refreshing(plan.key)
+
+        # After a restart the last known result is served from disk while it is refreshed in the background
+        snapshot = _read_snapshot(plan.key) if entry is None else None
+        if snapshot is not None and not scheduler.too_stale(snapshot.fetched_at):
+            sample.update(cache="hit", source="snapshot", **frame_stats(snapshot.frame))
+            cache.put(plan.key, snapshot.frame, fetched_at=snapshot.fetched_at)
+            scheduler.refresh(plan)
+            return snapshot.frame, snapshot.fetched_at, True, True
+
+        data, fetched_at = scheduler.load(plan)
+        sample.update(cache="miss", **frame_stats(data))
+        return data, fetched_at, False, False
+
+def _load(plan):
+    """
+    Runs a plan's loader and stores the normalised frame in the result cache and snapshot store.
+    """
+    data = plan.loader()
+    with timed_stage("normalise", model=plan.key.model, **frame_stats(data)):
+        data = normalise_frame(data)
+    fetched_at = time.time()
+    _store(plan.key, data, fetched_at)
+    return data, fetched_at
+
+def _store(key, data, fetched_at):
+    if not data.empty:
+        get_result_cache().put(key, data, fetched_at=fetched_at)
+        _write_snapshot(key, data, fetched_at)
+
+def _snapshot_store_for(key):
+    # Only full warehouse models are kept on disk; sample data is already local
+    if key.variant is not None or key.destination not in ("BigQuery", "Snowflake"):
+        return None
+    return get_snapshot_store()
+
+def _read_snapshot(key):
+    store = _snapshot_store_for(key)
+    if store is None:
+        return None
+    snapshot = store.read(key)
+    # Seed the incremental store so the refresh only fetches periods that moved since the snapshot
+    if snapshot is not None and snapshot.period_watermarks and incremental_fetch_enabled():
+        incremental = get_incremental_store()
+        if incremental.get(key) is None:
+            incremental.put(key, snapshot.period_watermarks)
+    return snapshot
+
+def warm_snapshots():
+    """
+    Loads every snapshot in SNAPSHOT_DIR into the result cache, most recently fetched first,
+    so the first reads after a restart are served from memory. Warmed results are marked
+    expired, so each one is refreshed from the warehouse on its first read. Keys that were
+    loaded in the meantime are left as they are.
+    """
+    store = get_snapshot_store()
+    if store is None:
+        return
+    cache = get_result_cache()
+    scheduler = _get_scheduler()
+    for key in store.keys():
+        if cache.peek(key) is not None:
+            continue
+        snapshot = _read_snapshot(key)
+        if snapshot is None or scheduler.too_stale(snapshot.fetched_at) or cache.peek(key) is not None:
+            continue
+        cache.put(key, snapshot.frame, fetched_at=snapshot.fetched_at)
+        cache.expire(key.__eq__)
+
+_snapshot_warmup = None
+_snapshot_warmup_lock = threading.Lock()
+
+def start_snapshot_warmup():
+    """
+    Starts `warm_snapshots` on a background thread once per process. Called at app start,
+    so no request waits on the snapshots being read.
+    """
+    global _snapshot_warmup
+    if _snapshot_warmup is None and get_snapshot_store() is not None:
+        with _snapshot_warmup_lock:
+            if _snapshot_warmup is None:
+                _snapshot_warmup = threading.Thread(target=warm_snapshots, name="netsuite-snapshot-warmup", daemon=True)
+                _snapshot_warmup.start()
+
+def _write_snapshot(key, data, fetched_at):
+    store = _snapshot_store_for(key)
+    if store is None:
+        return
+    watermarks = get_incremental_store().get(key) if incremental_fetch_enabled() else None
+    try:
+        store.write(key, data, fetched_at, watermarks)
+    except OSError as e:
+        logger.warning("Could not write snapshot for %s: %s", key.model, e)
+
+def _try_fetch(plan):
+    try:
+        return _fetch(plan), None
+    except WarehouseConnectionError as e:
+        return None, e
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """
+    Returns the process-wide thread pool used for concurrent loads.
+    Its size is read from LOAD_WORKERS.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("LOAD_WORKERS", 4)), thread_name_prefix="netsuite-load"
+                )
+    return _executor
+
+def _get_scheduler():
+    return get_refresh_scheduler(_load)
+
+def request_refresh(predicate=None):
+    """
+    Refreshes every recently read report whose cache key matches `predicate` in the background,
+    e.g. after a period close. Readers keep getting the current frames until the new ones land.
+    Without a refresh schedule, the matching results are reloaded on their next read instead.
+    """
+    _get_scheduler().signal(predicate)
+
+def _credentials_allowed(plans):
+    # Cached warehouse results are only shared with, and loads only started for, sessions whose own credentials can connect
+    if any(plan.key.destination == "Snowflake" for plan in plans) and not credentials_verified():
+        return verify_snowflake_credentials()
+    return True
+
+def _run_plans(plans, concurrent=False):
+    """
+    Executes load plans for the current session and returns their frames in order.
+
+    Shows the loading status, checks the session's Snowflake credentials before any shared
+    cached result is served, and reports connection errors. With `concurrent`, the plans run
+    in parallel on the load thread pool.
+    """
+    data_load_state = st.text('Loading data...')
+
+    if not _credentials_allowed(plans):
+        st.error("Unable to connect to Snowflake. Please check your credentials.")
+        data_load_state.text("")
+        return [pd.DataFrame() for _ in plans]
+
+    if concurrent and len(plans) > 1:
+        futures = [_get_executor().submit(_try_fetch, plan) for plan in plans]
+        outcomes = [future.result() for future in futures]
+    else:
+        outcomes = [_try_fetch(plan) for plan in plans]
+
+    frames = []
+    fetched = []
+    for plan, (result, error) in zip(plans, outcomes):
+        if error is not None:
+            st.error(f"{error} Please check your credentials.")
+            frames.append(pd.DataFrame())
+            continue
+        data, fetched_at, from_cache, refreshing = result
+        fetched.append((fetched_at, from_cache, refreshing))
+        frames.append(plan.transform(data) if plan.transform is not None else data)
+
+    data_load_state.text(_freshness(fetched))
+    return frames
+
+def _freshness(fetched):
+    """
+    Describes how fresh the loaded data is from its (fetched_at, from_cache, refreshing) outcomes.
+    """
+    if not fetched:
+        return ""
+    if not any(from_cache for _, from_cache, _ in fetched):
+        return "Done! (using fresh data)"
+
+    oldest = min(fetched_at for fetched_at, _, _ in fetched)
+    minutes = int((time.time() - oldest) // 60)
+    age = "just now" if minutes < 1 else f"{minutes} min ago"
+    text = f"using cached data from {datetime.datetime.fromtimestamp(oldest).strftime('%H:%M:%S')}, fetched {age}"
+    if any(refreshing for _, _, refreshing in fetched):
+        text += "; refreshing in the background"
+    return f"Done! ({text})"
+
+def query_results(destination, database, schema, model='bs'):
+    """
+    Returns the report model for the current accounting book and role.
+
+    Results are shared across sessions through the process-wide result cache, so a rerun
+    only queries the warehouse when the cached frame is missing or older than its TTL.
+    The returned frame is shared and must not be modified in place.
+    """
+    if _missing_location(destination, database, schema):
+        st.warning("Results will be displayed once your database and schema are provided.")
+        return pd.DataFrame()
+
+    return _run_plans([_plan_results(destination, database, schema, model)])[0]
+
+def fetch_report(destination, database, schema, model, accounting_book_id, role=None, connection_params=None, fresh=False):
+    """
+    Returns the normalised report model of one accounting book without touching Streamlit or session state,
+    e.g. for batch jobs. Goes through the same process-wide result cache as the pages.
+    With `fresh`, the model is loaded from its source before returning instead of being served from the
+    cache or a snapshot; the loaded frame still replaces the cached one.
+    Raises WarehouseConnectionError if no Snowflake connection could be opened.
+    """
+    key = ResultKey(destination, database, schema, model, accounting_book_id, role if destination == "Snowflake" else None)
+    plan = _report_plan(key, connection_params)
+    if fresh:
+        return _get_scheduler().load(plan)[0]
+    return _fetch(plan)[0]
+
+def query_periods(destination, database, schema, model='bs'):
+    """
+    Returns the distinct accounting periods of a report model, with
+    `accounting_period_name` and `accounting_period_ending` columns.
+
+    With QUERY_PUSHDOWN enabled, warehouse destinations answer this with a small distinct
+    periods query instead of loading the full model history.
+    """
+    if _missing_location(destination, database, schema):
+        st.warning("Results will be displayed once your database and schema are provided.")
+        return pd.DataFrame()
+
+    return _run_plans([_plan_periods(destination, database, schema, model)])[0]
+
+def query_results_for_range(destination, database, schema, start, end, model='bs', categories=None, columns=None):
+    """
+    Returns the report rows of a model for periods ending between `start` and `end`.
+
+    With QUERY_PUSHDOWN enabled, warehouse destinations put the range, the optional account
+    categories and the column projection into the SQL as bind parameters, so only the selected
+    periods are scanned and transferred. Otherwise the full cached model is returned and callers
+    narrow it down with `filter_data`.
+    """
+    if _missing_location(destination, database, schema):
+        st.warning("Results will be displayed once your database and schema are provided.")
+        return pd.DataFrame()
+
+    return _run_plans([_plan_range(destination, database, schema, model, start, end, categories, columns)])[0]
+
+def load_models(destination, database, schema, models=('bs', 'is'), start=None, end=None):
+    """
+    Loads several report models concurrently and returns their frames in the order of `models`.
+
+    Without a range the full models are loaded, otherwise the rows between `start` and `end`
+    as in `query_results_for_range`. The call returns once every model has landed.
+    """
+    if _missing_location(destination, database, schema):
+        st.warning("Results will be displayed once your database and schema are provided.")
+        return [pd.DataFrame() for _ in models]
+
+    if start is None and end is None:
+        plans = [_plan_results(destination, database, schema, model) for model in models]
+    else:
+        plans = [_plan_range(destination, database, schema, model, start, end) for model in models]
+    return _run_plans(plans, concurrent=True)
+
+def prefetch_models(destination, database, schema, models=('bs', 'is'), wait=True):
+    """
+    Warms the result cache with what the date filters of `models` need: the distinct periods with
+    QUERY_PUSHDOWN enabled, otherwise the full models. The loads run concurrently.
+
+    With `wait=False` the loads continue in the background and their futures are returned,
+    e.g. to warm the cache at login without holding up the page. Nothing is loaded if the
+    session's Snowflake credentials cannot connect.
+    """
+    if _missing_location(destination, database, schema):
+        return []
+
+    plans = [_plan_periods(destination, database, schema, model) for model in models]
+    if wait:
+        return _run_plans(plans, concurrent=True)
+    if not _credentials_allowed(plans):
+        return []
+    return [_get_executor().submit(_try_fetch, plan) for plan in plans]
@@ -0,0 +1,155 @@
+import json
+from collections import namedtuple
+
+# Report models and the column each one is ordered by
+REPORT_TABLES = {
+    'bs': 'netsuite2__balance_sheet',
+    'is': 'netsuite2__income_statement',
+}
+SORT_HELPERS = {
+    'bs': 'balance_sheet_sort_helper',
+    'is': 'income_statement_sort_helper',
+}
+
+# Dimension columns that can be projected into a report query
+REPORT_DIMENSIONS = [
+    'accounting_period_name',
+    'accounting_period_ending',
+    'account_category',
+    'account_name',
+    'account_type_name',
+]
+
+
+class Statement(namedtuple("Statement", ["sql", "params"])):
+    """
+    A SQL statement and its bind parameters as an ordered tuple of (name, value) pairs.
+
+    The SQL text only depends on the model, the destination dialect and which filters are used,
+    never on the filter values, so identical reports share one statement and warehouse caches hit.
+    """
+    __slots__ = ()
+
+    def cache_key(self):
+        return (self.sql, self.params)
+
+    def positional(self):
+        """
+        Returns the parameter values in placeholder order, for qmark-style clients.
+        """
+        return [value for _, value in self.params]
+
+
+class _Builder:
+    """
+    Accumulates SQL fragments and bind parameters for one destination dialect.
+    """
+
+    def __init__(self, dialect):
+        if dialect not in ("Snowflake", "BigQuery"):
+            raise ValueError(f"Unsupported destination dialect: {dialect}")
+        self.dialect = dialect
+        self.parts = []
+        self.params = []
+
+    def sql(self, text):
+        self.parts.append(text)
+        return self
+
+    def bind(self, name, value):
+        """
+        Adds a scalar bind parameter and returns its placeholder.
+        """
+        self.params.append((name, value))
+        return "@" + name if self.dialect == "BigQuery" else "?"
+
+    def bind_list(self, name, values, sql_type):
+        """
+        Adds a list bind parameter and returns an expression usable on the right of `in`.
+        Lists are bound as a single parameter so the statement text does not depend on their length.
+        """
+        values = tuple(values)
+        if self.dialect == "BigQuery":
+            self.params.append((name, values))
+            return "unnest(@" + name + ")"
+        self.params.append((name, json.dumps([str(value) for value in values])))
+        return "(select value::" + sql_type + " from table(flatten(input => parse_json(?))))"
+
+    def table(self, database, schema, model):
+        table = database + "." + schema + "." + REPORT_TABLES[model]
+        if self.dialect == "BigQuery":
+            # BigQuery cannot bind table names
+            return "`" + table + "`"
+        return "identifier(" + self.bind("table_name", table) + ")"
+
+    def build(self):
+        return Statement(" ".join(self.parts), tuple(self.params))
+
+
+def report_statement(dialect, database, schema, model, accounting_book_id, periods=None,
+                     start=None, end=None, categories=None, columns=None):
+    """
+    Builds the report query for a model.
+
+    The query can be restricted to a list of period ending dates, to a start/end period range
+    and to a list of account categories, and `columns` projects a subset of the dimension columns.
+    """
+    builder = _Builder(dialect)
+    sort_helper = SORT_HELPERS[model]
+    dimensions = [sort_helper] + [column for column in REPORT_DIMENSIONS if columns is None or column in columns]
+
+    builder.sql("select " + ", ".join(dimensions) + ", round(sum(transaction_amount),2) as balance")
+    builder.sql("from " + builder.table(database, schema, model))
+    builder.sql("where accounting_book_id = " + builder.bind("accounting_book_id", int(accounting_book_id)))
+    if periods is not None:
+        builder.sql("and cast(accounting_period_ending as date) in " + builder.bind_list("periods", periods, "date"))
+    if start is not None:
+        builder.sql("and cast(accounting_period_ending as date) >= " + builder.bind("start_period", start))
+    if end is not None:
+        builder.sql("and cast(accounting_period_ending as date) <= " + builder.bind("end_period", end))
+    if categories:
+        builder.sql("and account_category in " + builder.bind_list("categories", categories, "string"))
+    builder.sql("group by " + ",".join(str(i) for i in range(1, len(dimensions) + 1)))
+    builder.sql("order by " + sort_helper)
+    return builder.build()
+
+
+def books_report_statement(dialect, database, schema, model, accounting_book_ids):
+    """
+    Builds a report query for several accounting books at once.
+    Rows carry their `accounting_book_id` so the result can be split per book.
+    """
+    builder = _Builder(dialect)
+    sort_helper = SORT_HELPERS[model]
+    dimensions = ['accounting_book_id', sort_helper] + REPORT_DIMENSIONS
+
+    builder.sql("select " + ", ".join(dimensions) + ", round(sum(transaction_amount),2) as balance")
+    builder.sql("from " + builder.table(database, schema, model))
+    builder.sql("where accounting_book_id in " + builder.bind_list("accounting_book_ids", [int(book) for book in accounting_book_ids], "int"))
+    builder.sql("group by " + ",".join(str(i) for i in range(1, len(dimensions) + 1)))
+    builder.sql("order by accounting_book_id, " + sort_helper)
+    return builder.build()
+
+
+def periods_statement(dialect, database, schema, model, accounting_book_id):
+    """
+    Builds the distinct periods query that feeds the date filter selectboxes.
+    """
+    builder = _Builder(dialect)
+    builder.sql("select distinct accounting_period_name, cast(accounting_period_ending as date) as accounting_period_ending")
+    builder.sql("from " + builder.table(database, schema, model))
+    builder.sql("where accounting_book_id = " + builder.bind("accounting_book_id", int(accounting_book_id)))
+    return builder.build()
+
+
+def watermark_statement(dialect, database, schema, model, accounting_book_id):
+    """
+    Builds the per-period watermark query used to detect periods that changed at the source.
+    """
+    builder = _Builder(dialect)
+    builder.sql("select cast(accounting_period_ending as date) as accounting_period_ending,")
+    builder.sql("count(*) as row_count, round(sum(transaction_amount),2) as amount")
+    builder.sql("from " + builder.table(database, schema, model))
+    builder.sql("where accounting_book_id = " + builder.bind("accounting_book_id", int(accounting_book_id)))
+    builder.sql("group by 1")
+    return builder.build()
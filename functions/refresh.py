@@ -0,0 +1,199 @@
+import os
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from functions.cache import get_result_cache
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden with environment variables (see ENV_VARS.md)
+DEFAULT_REFRESH_INTERVAL_SECONDS = 0
+DEFAULT_REFRESH_IDLE_SECONDS = 3600
+DEFAULT_REFRESH_WORKERS = 2
+DEFAULT_REFRESH_MAX_STALE_SECONDS = 3600
+
+
+class RefreshScheduler:
+    """
+    Keeps cached report models fresh outside of Streamlit reruns.
+
+    Every load goes through the scheduler, which runs at most one load per key at a time:
+    concurrent misses for the same key wait on the load already in flight instead of
+    querying the warehouse again. Background refreshes replace the cached frame in a
+    single swap when they finish, so readers keep getting the previous version until then.
+
+    With `interval_seconds` set, a daemon thread also refreshes every key read within the
+    last `idle_seconds` once its cached frame is older than the interval. `signal()` marks
+    keys (e.g. after a period close) to be refreshed on the next wake-up.
+
+    Frames fetched more than `max_stale_seconds` ago are not served while refreshes keep
+    failing: readers load them again instead (see `too_stale`).
+    """
+
+    def __init__(self, load, executor, interval_seconds=DEFAULT_REFRESH_INTERVAL_SECONDS,
+                 idle_seconds=DEFAULT_REFRESH_IDLE_SECONDS, max_stale_seconds=DEFAULT_REFRESH_MAX_STALE_SECONDS):
+        self._load = load
+        self._executor = executor
+        self.interval_seconds = interval_seconds
+        self.idle_seconds = idle_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._plans = {}
+        self._last_read = {}
+        self._due = set()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def register(self, plan):
+        """
+        Records that `plan` was read, so the schedule keeps its key fresh.
+        Nothing is recorded when the schedule is disabled, as plans hold the session's connection parameters.
+        """
+        if not self.interval_seconds:
+            return
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._plans[plan.key] = plan
+            self._last_read[plan.key] = now
+        if self._thread is None:
+            self._start()
+
+    def load(self, plan):
+        """
+        Loads `plan` in the calling thread, or waits for the load of its key already in flight.
+        Returns the load's result, or raises the exception of the caller's own load: a load in
+        flight that fails, e.g. with another session's bad credentials, is retried with `plan`.
+        """
+        while True:
+            with self._lock:
+                future = self._inflight.get(plan.key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[plan.key] = Future()
+            if leader:
+                self._execute(plan, future)
+                return future.result()
+            try:
+                return future.result()
+            except Exception:
+                continue
+
+    def refresh(self, plan):
+        """
+        Reloads `plan` on the executor unless a load of its key is already in flight.
+        Returns True if a refresh was started.
+        """
+        with self._lock:
+            if plan.key in self._inflight:
+                return False
+            future = self._inflight[plan.key] = Future()
+        future.add_done_callback(lambda done: self._log_failure(plan, done))
+        self._executor.submit(self._execute, plan, future)
+        return True
+
+    def refreshing(self, key):
+        with self._lock:
+            return key in self._inflight
+
+    def too_stale(self, fetched_at, now=None):
+        """
+        Returns True if a frame fetched at `fetched_at` is too old to be served while it is refreshed.
+        """
+        age = (now if now is not None else time.time()) - fetched_at
+        return bool(self.max_stale_seconds) and age > self.max_stale_seconds
+
+    def signal(self, predicate=None):
+        """
+        Marks every registered key matching `predicate`, or all of them, for refresh on the next wake-up.
+        Without a schedule the matching cached results are marked expired instead, so their next
+        read serves them while they are reloaded.
+        """
+        if self._thread is None:
+            get_result_cache().expire(predicate)
+            return
+        with self._lock:
+            self._due.update(key for key in self._plans if predicate is None or predicate(key))
+        self._wake.set()
+
+    def _execute(self, plan, future):
+        try:
+            future.set_result(self._load(plan))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(plan.key, None)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="netsuite-refresh", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+            for plan in self._due_plans():
+                self.refresh(plan)
+
+    def _due_plans(self):
+        cache = get_result_cache()
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            due = []
+            for key, plan in self._plans.items():
+                entry = cache.peek(key)
+                if key in self._due or entry is None or entry.age(now) >= self.interval_seconds:
+                    due.append(plan)
+            self._due.clear()
+            return due
+
+    def _prune(self, now):
+        # Keys nobody has read for a while are dropped instead of refreshed; called with the lock held
+        for key in [key for key, read in self._last_read.items() if now - read > self.idle_seconds]:
+            del self._plans[key]
+            del self._last_read[key]
+            self._due.discard(key)
+
+    @staticmethod
+    def _log_failure(plan, future):
+        # Readers keep getting the previous frame and the next refresh tries again
+        if future.exception() is not None:
+            logger.warning("Background refresh of %s failed: %s", plan.key.model, future.exception())
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_refresh_scheduler(load):
+    """
+    Returns the process-wide RefreshScheduler, creating it on first use with `load`.
+    The schedule is read from REFRESH_INTERVAL_SECONDS and REFRESH_IDLE_SECONDS, and the
+    maximum staleness of served frames from REFRESH_MAX_STALE_SECONDS.
+
+    Refreshes run on their own thread pool (REFRESH_WORKERS), so loads waiting on a
+    refresh in flight never wait on a task queued behind them.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("REFRESH_WORKERS", DEFAULT_REFRESH_WORKERS)),
+                    thread_name_prefix="netsuite-refresh",
+                )
+                _scheduler = RefreshScheduler(
+                    load, executor,
+                    interval_seconds=int(os.environ.get("REFRESH_INTERVAL_SECONDS", DEFAULT_REFRESH_INTERVAL_SECONDS)),
+                    idle_seconds=int(os.environ.get("REFRESH_IDLE_SECONDS", DEFAULT_REFRESH_IDLE_SECONDS)),
+                    max_stale_seconds=int(os.environ.get("REFRESH_MAX_STALE_SECONDS", DEFAULT_REFRESH_MAX_STALE_SECONDS)),
+                )
+    return _scheduler
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+from functions.cube import cube_for
+from functions.instrumentation import frame_stats, timed_stage
+from functions.layout import period_layouts, statement_layout
+from functions.period_index import period_index_for
+from functions.windows import income_metrics
+
+# Account categories of the income statement, left out of balance sheets
+INCOME_CATEGORIES = ['Income', 'Expense']
+
+# Balance sheet positions at the last period of a range, with the income statement metrics over it
+KeyMetrics = namedtuple("KeyMetrics", [
+    "period_ending", "current_assets", "current_liabilities", "inventory", "cash_balance",
+    "working_capital", "current_ratio", "quick_ratio", "liquidity_ratio", "income",
+])
+
+# Income statement sections for a range with the resulting net profit
+ProfitAndLoss = namedtuple("ProfitAndLoss", ["categories", "revenue", "expense", "net_profit"])
+
+
+def select_range(data, start, end):
+    """
+    Returns the report rows for periods ending between `start` and `end`.
+    The result may share memory with `data` and must not be modified in place.
+    """
+    with timed_stage("filter_data") as sample:
+        if 'period_key' in data.columns:
+            # Normalised frames carry integer period keys, so the range is a slice of the period index
+            selected = data.iloc[period_index_for(data).positions(start, end)]
+        else:
+            selected = data.query("`accounting_period_ending` >= @start and `accounting_period_ending` <= @end")
+        sample.update(frame_stats(selected))
+    return selected
+
+
+def balance_sheet(data, start, end):
+    """
+    Returns one PeriodLayout per period in the range, latest period first, without income statement accounts.
+    """
+    selected = select_range(data, start, end)
+    return period_layouts(selected[~selected['account_category'].isin(INCOME_CATEGORIES)])
+
+
+def profit_and_loss(data, start, end):
+    """
+    Returns the ProfitAndLoss of a range: its category sections, revenue, expense and net profit.
+    """
+    cube = cube_for(data)
+    revenue = cube.total(start, end, category='Income')
+    expense = cube.total(start, end, category='Expense')
+    # Expense balances are negative, so adding them to revenue gives the net profit
+    return ProfitAndLoss(statement_layout(select_range(data, start, end)), revenue, expense, revenue - expense * - 1)
+
+
+def key_metrics(bs_data, is_data, start, end, window='range'):
+    """
+    Returns the dashboard KeyMetrics: balances and liquidity ratios at the latest period in the range,
+    and the income statement metrics over `window` (see functions.windows.WINDOWS).
+    """
+    bs_cube = cube_for(bs_data)
+    latest = bs_cube.latest_period(start, end) or end
+
+    current_assets = bs_cube.total(latest, latest, category='asset')
+    current_liabilities = bs_cube.total(latest, latest, category='liability')
+    inventory = bs_cube.total_matching('inventory', latest, latest)
+    cash_balance = bs_cube.total_matching('cash and cash equivalents', latest, latest)
+
+    def ratio(numerator):
+        return numerator / current_liabilities if current_liabilities != 0 else 0
+
+    return KeyMetrics(
+        period_ending=latest,
+        current_assets=current_assets,
+        current_liabilities=current_liabilities,
+        inventory=inventory,
+        cash_balance=cash_balance,
+        working_capital=current_assets - current_liabilities,
+        current_ratio=ratio(current_assets),
+        quick_ratio=ratio(current_assets - inventory),
+        liquidity_ratio=ratio(cash_balance),
+        income=income_metrics(cube_for(is_data), end, window, start),
+    )
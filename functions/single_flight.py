@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import Future
+
+
+def normalise_sql(sql):
+    """
+    Collapses whitespace in generated SQL so formatting differences map to the same statement.
+    """
+    return " ".join(sql.split())
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    Callers arriving while a call for their key is in flight wait for it and get the same
+    result object instead of running the call again. Results are shared, not copied, so
+    they must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Returns `fn()` for `key`, or the result of the call for `key` already in flight.
+        Failures are not shared: callers waiting on a call that raises run it again, one of them
+        as the new leader, so one caller's failure (e.g. bad credentials) never fails the others.
+        """
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+                    self.calls += 1
+                else:
+                    self.shared += 1
+
+            if leader:
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    with self._lock:
+                        del self._inflight[key]
+                return future.result()
+
+            try:
+                return future.result()
+            except Exception:
+                continue
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+_warehouse_flight = SingleFlight()
+
+
+def get_warehouse_flight():
+    """
+    Returns the process-wide SingleFlight used for warehouse queries.
+    """
+    return _warehouse_flight
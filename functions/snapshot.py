@@ -0,0 +1,178 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from functions.cache import ResultKey
+
+# A report frame read back from disk along with its manifest entry
+Snapshot = namedtuple("Snapshot", ["frame", "fetched_at", "rows", "watermark", "period_watermarks"])
+
+MANIFEST_NAME = "manifest.json"
+
+
+def write_frame(path, frame):
+    """
+    Writes a frame to an uncompressed Feather (Arrow IPC) file so it can be memory-mapped on read.
+    The file is written next to `path` first and moved into place, so readers never see a partial file.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    # pandas metadata is dropped so files read back the same under any pandas version;
+    # categoricals round-trip as Arrow dictionaries and dates as date32
+    table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(None)
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    feather.write_feather(table, partial, compression="uncompressed")
+    os.replace(partial, path)
+
+
+def read_frame(path):
+    """
+    Reads a Feather file written by `write_frame` through a memory map.
+    Numeric columns are kept as read-only views of the mapped file instead of being copied;
+    only string and date columns are converted into new arrays.
+    """
+    import pyarrow.feather as feather
+
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _file_name(key):
+    raw = "\x00".join(str(part) for part in key)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest() + ".feather"
+
+
+def _encode_watermarks(watermarks):
+    if watermarks is None:
+        return None
+    return {period.isoformat(): list(mark) for period, mark in watermarks.items()}
+
+
+def _decode_watermarks(watermarks):
+    if watermarks is None:
+        return None
+    return {datetime.date.fromisoformat(period): tuple(mark) for period, mark in watermarks.items()}
+
+
+class SnapshotStore:
+    """
+    Local on-disk copy of loaded report models, one Feather file per result cache key.
+
+    A manifest records when each snapshot was fetched, its row count and source watermark
+    (the latest period ending it holds, plus the per-period watermarks when incremental
+    fetch is enabled). Snapshots survive restarts, so a cold process can serve the last
+    known result straight from disk while the warehouse is queried in the background.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._manifest = self._read_manifest()
+
+    def read(self, key):
+        """
+        Returns the Snapshot for `key`, or None if there is none or its file is unreadable.
+        """
+        with self._lock:
+            entry = self._manifest.get(_file_name(key))
+        if entry is None:
+            return None
+        try:
+            frame = read_frame(os.path.join(self.directory, _file_name(key)))
+        except (OSError, ValueError):
+            return None
+        return Snapshot(
+            frame, entry["fetched_at"], entry["rows"], entry["watermark"],
+            _decode_watermarks(entry.get("period_watermarks")),
+        )
+
+    def write(self, key, frame, fetched_at=None, period_watermarks=None):
+        name = _file_name(key)
+        write_frame(os.path.join(self.directory, name), frame)
+
+        watermark = None
+        if 'accounting_period_ending' in frame.columns and frame['accounting_period_ending'].notna().any():
+            watermark = pd.Timestamp(frame['accounting_period_ending'].dropna().max()).date().isoformat()
+
+        with self._lock:
+            self._manifest[name] = {
+                "key": list(key),
+                "fetched_at": fetched_at if fetched_at is not None else time.time(),
+                "rows": len(frame),
+                "watermark": watermark,
+                "period_watermarks": _encode_watermarks(period_watermarks),
+            }
+            self._write_manifest()
+
+    def invalidate(self, predicate=None):
+        """
+        Removes every snapshot whose key matches `predicate`, or all snapshots if no predicate is given.
+        """
+        with self._lock:
+            names = [
+                name for name, entry in self._manifest.items()
+                if predicate is None or predicate(ResultKey(*entry["key"]))
+            ]
+            for name in names:
+                del self._manifest[name]
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            self._write_manifest()
+            return len(names)
+
+    def entries(self):
+        with self._lock:
+            return [dict(entry) for entry in self._manifest.values()]
+
+    def keys(self):
+        """
+        Returns the ResultKey of every snapshot, most recently fetched first.
+        """
+        with self._lock:
+            entries = sorted(self._manifest.values(), key=lambda entry: entry["fetched_at"], reverse=True)
+        return [ResultKey(*entry["key"]) for entry in entries]
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(partial, path)
+
+
+def snapshot_enabled():
+    return bool(os.environ.get("SNAPSHOT_DIR"))
+
+
+_snapshot_store = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """
+    Returns the process-wide SnapshotStore in SNAPSHOT_DIR, or None if snapshots are disabled.
+    """
+    global _snapshot_store
+    if not snapshot_enabled():
+        return None
+    if _snapshot_store is None:
+        with _snapshot_store_lock:
+            if _snapshot_store is None:
+                _snapshot_store = SnapshotStore(os.environ["SNAPSHOT_DIR"])
+    return _snapshot_store
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from functions.query_builder import SORT_HELPERS
+
+# Sample reports the synthetic accounts are modelled on
+SAMPLE_FILES = {
+    'bs': 'data/dunder_mifflin_balance_sheet.csv',
+    'is': 'data/dunder_mifflin_income_statement.csv',
+}
+
+ACCOUNT_COLUMNS = ['account_category', 'account_type_name', 'account_name']
+
+
+def _account_templates(model):
+    """
+    Returns one row per sample account with its sort helper, the share of negative balances
+    and the median absolute balance, used to draw realistic synthetic balances.
+    """
+    sample = pd.read_csv(SAMPLE_FILES[model])
+    sort_helper = SORT_HELPERS[model]
+    balance = sample['balance'].astype(float)
+    templates = sample.assign(negative=balance < 0, magnitude=balance.abs()).groupby(ACCOUNT_COLUMNS, sort=False).agg(
+        sort_helper=(sort_helper, 'first'),
+        negative=('negative', 'mean'),
+        magnitude=('magnitude', 'median'),
+    )
+    return templates.reset_index()
+
+
+def period_endings(periods, first='2020-01-31'):
+    """
+    Returns `periods` consecutive month end dates starting at `first`.
+    """
+    return pd.date_range(first, periods=periods, freq='ME')
+
+
+def synthetic_report(model='bs', rows=100000, periods=24, books=1, seed=0):
+    """
+    Generates a `netsuite2__balance_sheet` or `netsuite2__income_statement` shaped frame of about
+    `rows` rows, as accounts × periods × books.
+
+    Accounts are the sample's accounts, repeated with a numbered suffix when more are needed,
+    so categories, account types, naming and the sign and size of balances follow the sample.
+    `accounting_period_ending` holds timestamp strings in the format the warehouse exports use.
+    """
+    rng = np.random.default_rng(seed)
+    templates = _account_templates(model)
+    accounts = max(1, math.ceil(rows / (periods * books)))
+
+    # Accounts beyond the sample's are copies of a sample account with a numbered suffix
+    source = np.arange(accounts) % len(templates)
+    copy = np.arange(accounts) // len(templates)
+    chart = templates.iloc[source].reset_index(drop=True)
+    chart['account_name'] = np.where(
+        copy == 0, chart['account_name'], chart['account_name'] + ' ' + pd.Series(copy).map('{:04d}'.format)
+    )
+
+    endings = period_endings(periods)
+    account_index = np.tile(np.arange(accounts), periods * books)
+    period_index = np.repeat(np.tile(np.arange(periods), books), accounts)
+    book_index = np.repeat(np.arange(books), periods * accounts) + 1
+
+    magnitude = chart['magnitude'].to_numpy()[account_index]
+    negative = rng.random(len(account_index)) < chart['negative'].to_numpy()[account_index]
+    balance = np.round(rng.lognormal(np.log1p(magnitude), 1.0) * np.where(negative, -1, 1), 2)
+
+    frame = pd.DataFrame({
+        SORT_HELPERS[model]: chart['sort_helper'].to_numpy()[account_index],
+        'accounting_period_name': endings.strftime('%b %Y')[period_index],
+        'accounting_period_ending': endings.strftime('%Y-%m-%d 00:00:00.000000 UTC')[period_index],
+        'account_category': chart['account_category'].to_numpy()[account_index],
+        'account_name': chart['account_name'].to_numpy()[account_index],
+        'account_type_name': chart['account_type_name'].to_numpy()[account_index],
+        'balance': balance,
+        'accounting_book_id': book_index,
+    })
+    return frame.sort_values(SORT_HELPERS[model], kind='stable', ignore_index=True)
@@ -0,0 +1,116 @@
+import os
+import datetime
+from collections import namedtuple
+
+import pandas as pd
+
+# Aggregation windows offered for income statement metrics, ending at the selected end period
+WINDOWS = {
+    'range': "Selected range",
+    'ytd': "Year to date",
+    'qtd': "Quarter to date",
+    'ttm': "Trailing twelve months",
+}
+
+# Income statement totals and ratios over one window
+IncomeMetrics = namedtuple("IncomeMetrics", [
+    "revenue", "cogs", "opex", "expense",
+    "gross_profit", "operating_profit", "net_profit",
+    "gross_margin", "opex_ratio", "operating_margin", "net_margin",
+])
+
+
+def fiscal_year_start_month():
+    return int(os.environ.get("FISCAL_YEAR_START_MONTH", 1))
+
+
+def _month_index(date):
+    return date.year * 12 + date.month - 1
+
+
+def _first_day(month_index):
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def window_start(end, window, start=None):
+    """
+    Returns the earliest date of `window` ending at the period ending `end`.
+    Periods ending on or after this date and on or before `end` fall in the window.
+    The 'range' window starts at `start`, the start of the selected range.
+    """
+    if window == 'range':
+        return start
+    month = _month_index(end)
+    if window == 'ttm':
+        return _first_day(month - 11)
+
+    # Year and quarter boundaries follow the fiscal year
+    fiscal_offset = (month - (fiscal_year_start_month() - 1)) % 12
+    if window == 'ytd':
+        return _first_day(month - fiscal_offset)
+    if window == 'qtd':
+        return _first_day(month - fiscal_offset % 3)
+    raise ValueError(f"Unknown window: {window}")
+
+
+def history_start(end, start=None, points=12):
+    """
+    Returns the earliest date read by any window ending at `end` and by the `points` trailing
+    trend points before it, assuming monthly periods, or `start` if that is earlier.
+    Loading from here up to `end` gives the cubes every period the windows and trends use.
+    """
+    # The oldest trend point ends `points - 1` months before `end`, and its trailing twelve months reach 11 further back
+    earliest = _first_day(_month_index(end) - (points - 1) - 11)
+    return min(earliest, start) if start is not None else earliest
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator != 0 else float('nan')
+
+
+def _metrics(revenue, cogs, opex, expense):
+    # Expenses carry negative balances, matching the dashboard's sign conventions
+    gross_profit = revenue - (cogs * -1)
+    operating_profit = revenue - (opex * -1)
+    net_profit = revenue - (expense * -1)
+    return IncomeMetrics(
+        revenue, cogs, opex, expense,
+        gross_profit, operating_profit, net_profit,
+        _ratio(gross_profit, revenue) * 100,
+        _ratio(opex, revenue),
+        _ratio(operating_profit, revenue) * 100,
+        _ratio(net_profit, revenue) * 100,
+    )
+
+
+def _prefixes(cube):
+    return (
+        cube.prefix_totals(category='Income'),
+        cube.prefix_totals(account_type='Cost of Goods Sold'),
+        cube.prefix_totals(account_type='Expense'),
+        cube.prefix_totals(category='Expense'),
+    )
+
+
+def income_metrics(cube, end, window='range', start=None):
+    """
+    Returns the IncomeMetrics of an income statement cube over `window` ending at `end`.
+    Each total is a difference of two entries of the cube's prefix totals.
+    """
+    lo, hi = cube.period_slice(window_start(end, window, start), end)
+    return _metrics(*(float(prefix[hi] - prefix[lo]) for prefix in _prefixes(cube)))
+
+
+def metric_trend(cube, end, metric, window='range', start=None, points=12):
+    """
+    Returns `metric` (an IncomeMetrics field) computed over `window` ending at each of the last
+    `points` periods up to `end`, as a Series indexed by period ending.
+
+    With the 'range' window each point covers a single period of the selected range.
+    """
+    lo, hi = cube.period_slice(start if window == 'range' else None, end)
+    values = {}
+    for ending in cube.period_endings[max(lo, hi - points):hi]:
+        point_start = ending if window == 'range' else window_start(ending, window)
+        values[ending] = getattr(income_metrics(cube, ending, 'range', point_start), metric)
+    return pd.Series(values, dtype=float, name=metric)
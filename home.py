@@ -1,7 +1,11 @@
 import streamlit as st
 import os
 from functions.variables import database_schema_variables, destination_selection
-from functions.env_utils import display_sidebar_config
+from functions.env_utils import display_sidebar_config, credentials_fingerprint
+from functions.query import prefetch_models, start_snapshot_warmup
+
+# Load the on-disk report snapshots into memory in the background when the app starts
+start_snapshot_warmup()
 
 # Initialize authentication state if not already set
 if 'authenticated' not in st.session_state:
@@ -37,6 +41,11 @@ else:
     if st.session_state.snowflake_username and st.session_state.snowflake_password:
         destination = destination_selection()
         database, schema = database_schema_variables()
+
+        # Warm both report models in the background once per set of credentials
+        if st.session_state.get('prefetched') != credentials_fingerprint():
+            st.session_state.prefetched = credentials_fingerprint()
+            prefetch_models(destination, database, schema, wait=False)
         
         # Display welcome message
         st.title("NetSuite Dashboard")
@@ -1,3 +1,4 @@
+import time
 import streamlit as st
 import plost
 import pandas as pd
@@ -5,10 +6,17 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-from functions.filters import date_filter, filter_data, extract_second_item
+from functions.filters import date_filter
 from functions.variables import database_schema_variables, destination_selection
-from functions.query import query_results
+from functions.query import load_models, prefetch_models
+from functions.cube import cube_for
+from functions.charts import BUCKET_TITLES, revenue_vs_cogs
+from functions.figures import cached_figure
+from functions.hierarchy import hierarchy_for
+from functions.report import key_metrics
+from functions.windows import WINDOWS, history_start, income_metrics, metric_trend
 from functions.env_utils import display_sidebar_config
+from functions.instrumentation import record_stage
 # from functions.env_utils import setup_snowflake_connection
 
 # Authentication check
@@ -16,6 +24,8 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.warning("Please log in first")
     st.stop()  # This prevents the rest of the page from loading
 
+page_started = time.perf_counter()
+
 # Display Snowflake credentials in the sidebar
 display_sidebar_config()
 
@@ -30,85 +40,42 @@ else:
 
     ## Define the top level date filter
     st.subheader("Period(s) in review")
-    data, d = date_filter(dest=destination, db=database, sc=schema, md='bs')
-    bs_data = data
-    is_data = query_results(destination=destination, database=database, schema=schema, model='is')
+    # Warm both models concurrently instead of loading the balance sheet and income statement one after the other
+    prefetch_models(destination, database, schema, models=('bs', 'is'))
+    _, d = date_filter(dest=destination, db=database, sc=schema, md='bs', load=False)
 
     ## Only generate the tiles if date range is populated
     if d is not None and len(d) == 2:
         start_date, end_date = d
         if start_date is not None and start_date <= end_date:
-            ## Filter data based on filters applied
-            is_data_date_filtered = filter_data(start=start_date, end=end_date, data_ref=is_data, model='is')
-            bs_data_date_filtered = filter_data(start=start_date, end=end_date, data_ref=bs_data, model='bs')
+            # The YTD/QTD/TTM windows and their trends read periods before the selected range, so those are loaded too
+            bs_data, is_data = load_models(destination, database, schema, models=('bs', 'is'), start=history_start(end_date, start_date), end=end_date)
 
             ## KPI Metrics
             st.markdown('<hr style="height:2px;border:none;color:#333;background-color:#333;" />', unsafe_allow_html=True)
             st.subheader('High Level Balance and Totals')
 
-            metrics_data = bs_data_date_filtered.copy()
+            # Balances and ratios are looked up from the pre-aggregated cubes, outside Streamlit
+            bs_cube = cube_for(bs_data)
+            is_cube = cube_for(is_data)
+            metrics = key_metrics(bs_data, is_data, start_date, end_date)
             col1, col2 = st.columns(2)
 
-            metrics_data['accounting_period_ending'] = pd.to_datetime(metrics_data['accounting_period_ending'])
-            latest_date = metrics_data['accounting_period_ending'].max()
-
-            latest_current_assets = metrics_data[
-                (metrics_data['accounting_period_ending'] == latest_date) &
-                (metrics_data['account_category'].str.lower() == 'asset')
-            ]
-
-            latest_current_liabilities = metrics_data[
-                (metrics_data['accounting_period_ending'] == latest_date) &
-                (metrics_data['account_category'].str.lower() == 'liability')
-            ]
-
-            latest_cash_data = metrics_data[
-                (metrics_data['accounting_period_ending'] == latest_date) &
-                metrics_data['account_name'].str.lower().str.contains('cash and cash equivalents', case=False, na=False)
-            ]
-
-            latest_inventory_data = metrics_data[
-                (metrics_data['accounting_period_ending'] == latest_date) &
-                metrics_data['account_name'].str.lower().str.contains('inventory', case=False, na=False)
-            ]
-            current_assets = latest_current_assets['balance'].astype(float).sum()
-            current_liabilities = latest_current_liabilities['balance'].astype(float).sum()
-            inventory = latest_inventory_data['balance'].astype(float).sum()
-
-            metrics_data['accounting_period_ending'] = pd.to_datetime(metrics_data['accounting_period_ending'])
-            latest_date = metrics_data.copy()['accounting_period_ending'].max()
-            
             ## Cash balance and working capital
             with col1:
-                working_capital = current_assets - current_liabilities
+                working_capital = metrics.working_capital
                 formatted_working_capital = "${:,.2f}".format(working_capital)
                 st.metric("Working Capital", formatted_working_capital, delta=None, delta_color="normal", help=None, label_visibility="visible")
 
             with col2:
-                cash_balance = latest_cash_data['balance'].astype(float).sum()
-                formatted_cash_balance = "${:,.2f}".format(cash_balance)
+                formatted_cash_balance = "${:,.2f}".format(metrics.cash_balance)
                 st.metric("Cash Balance", formatted_cash_balance, delta=None, delta_color="normal", help=None, label_visibility="visible")
 
-            metric_df = is_data_date_filtered.copy()
-            # Convert balance to float for calculations
-            metric_df['balance'] = metric_df['balance'].astype(float)
-
-            # Calculate revenue and COGS
-            revenue = metric_df[metric_df['account_category'] == 'Income']['balance'].sum()
-            cogs = metric_df[metric_df['account_type_name'] == 'Cost of Goods Sold']['balance'].sum()
-            opp_expense = metric_df[metric_df['account_type_name'] == 'Expense']['balance'].sum()
-            all_expense = metric_df[metric_df['account_category'] == 'Expense']['balance'].sum()
-
-            # Calculate Gross Profit and Gross Profit Margin
-            gross_profit_cogs = revenue - (cogs * -1)
-            gross_profit_exp = revenue - (opp_expense * -1)
-            net_profit = revenue - (all_expense * -1)
-
-            # Calculate Ratios
-            opex_ratio = opp_expense / revenue
-            gross_profit_margin = (gross_profit_cogs / revenue) * 100
-            operating_profit_margin = (gross_profit_exp / revenue) * 100
-            net_profit_margin = (net_profit / revenue) * 100
+            # Revenue, COGS, expenses and margins over the selected range, from the cube's prefix totals
+            revenue = metrics.income.revenue
+            opp_expense = metrics.income.opex
+            gross_profit_cogs = metrics.income.gross_profit
+            net_profit = metrics.income.net_profit
 
             col1, col2 = st.columns(2)
             with col1:
@@ -142,115 +109,114 @@ else:
             st.markdown('<hr style="height:2px;border:none;color:#333;background-color:#333;" />', unsafe_allow_html=True)
             st.header("Revenue and Expenses by Type")
 
-            revenue_breakdown_data = is_data_date_filtered.copy()
-            revenue_breakdown_data['type'] = revenue_breakdown_data['account_name'].apply(extract_second_item)
-
-            revenue_data = revenue_breakdown_data[revenue_breakdown_data['account_category'] == 'Income']
-            grouped_revenues = revenue_data.groupby('type')['balance'].sum().reset_index()
-            grouped_revenues['balance'] = grouped_revenues['balance'].abs()
-
-            expense_breakdown_data = is_data_date_filtered.copy()
-            expense_breakdown_data['type'] = expense_breakdown_data['account_name'].apply(extract_second_item)
-            expense_data = expense_breakdown_data[expense_breakdown_data['account_category'] == 'Expense']
-            grouped_expenses = expense_data.groupby('type')['balance'].sum().reset_index()
-            grouped_expenses['balance'] = grouped_expenses['balance'].abs()
-
-            # Add a select box to choose between Revenue and Expense breakdown
-            selected_option = st.selectbox("Select a breakdown", ["Expenses", "Revenues"])
-
-            if selected_option == "Revenues":
-                fig = px.pie(grouped_revenues, names='type', values='balance', title="Revenues by Category", color='type', hole=0.3)
-                st.plotly_chart(fig)
-            else:
-                fig = px.pie(grouped_expenses, names='type', values='balance', title="Expenses by Category", color='type', hole=0.3)
-                st.plotly_chart(fig)
+            # Account names are split into "A : B : C" levels once per loaded frame
+            hierarchy = hierarchy_for(is_data)
+            breakdowns = {
+                "Expenses": ('Expense', "Expenses by Category", 'expense_pie'),
+                "Revenues": ('Income', "Revenues by Category", 'revenue_pie'),
+            }
+
+            def breakdown_pie(category, title, depth):
+                grouped = hierarchy.rollup(start_date, end_date, depth=depth, category=category)
+                grouped = pd.DataFrame({'type': grouped['name'], 'balance': grouped['balance'].abs()})
+                return px.pie(grouped, names='type', values='balance', title=title, color='type', hole=0.3)
+
+            # Second level of "A : B" names by default, or the first on a flat chart of accounts
+            default_depth = max(1, min(2, hierarchy.depth))
+
+            def breakdown_figure(option, depth=default_depth):
+                category, title, chart = breakdowns[option]
+                return cached_figure([is_data], start_date, end_date, f"{chart}_{depth}", lambda: breakdown_pie(category, title, depth))
+
+            # Both default breakdowns are built up front, so toggling between them is a swap
+            for option in breakdowns:
+                breakdown_figure(option)
+
+            # Changing the breakdown only reruns this fragment, not the whole dashboard
+            @st.fragment
+            def breakdown_chart():
+                # Add a select box to choose between Revenue and Expense breakdown
+                selected_option = st.selectbox("Select a breakdown", list(breakdowns))
+                # Deeper account hierarchies can be broken down at any of their levels
+                depth = default_depth
+                if hierarchy.depth > 2:
+                    depth = st.select_slider("Account level", options=list(range(1, hierarchy.depth + 1)), value=default_depth)
+                st.plotly_chart(breakdown_figure(selected_option, depth))
+
+            breakdown_chart()
 
             st.markdown('<hr style="height:2px;border:none;color:#333;background-color:#333;" />', unsafe_allow_html=True)
-            charts_df = is_data_date_filtered.copy()
-            charts_df['month'] = pd.to_datetime(charts_df['accounting_period_ending']).dt.month_name()
-            charts_df['balance'] = charts_df['balance'].apply(lambda x: abs(float(x)))
-            charts_df['month_num'] = pd.to_datetime(charts_df['accounting_period_ending']).dt.month
-            charts_df['month_name'] = pd.to_datetime(charts_df['accounting_period_ending']).dt.month_name()
-
-            # Filter for COGS and Income
-            cogs_data = charts_df[charts_df['account_type_name'] == 'Cost of Goods Sold']
-            income_data = charts_df[charts_df['account_category'] == 'Income']
-
-
-            # Group by month_name and month_num and aggregate by sum for balance and min for month_num
-            cogs_grouped = cogs_data.groupby(['month_name', 'month_num'])['balance'].sum().reset_index(name='COGS')
-            income_grouped = income_data.groupby(['month_name', 'month_num'])['balance'].sum().reset_index(name='Income')
+            # Revenue and COGS per period (quarters or years over long ranges), in chronological order
+            merged_df, bucket = revenue_vs_cogs(is_data, start_date, end_date)
 
-            # Merge the two dataframes on month_name and month_num
-            merged_df = pd.merge(income_grouped, cogs_grouped, on=['month_name', 'month_num'])
-
-            # Sort the merged_df by month_num to ensure months are in order
-            merged_df.sort_values('month_num', inplace=True)
-
-            st.subheader("Monthly Revenue vs COGS")
-            # Create the bar chart using 'month_name' for the x-axis
-            fig = px.bar(merged_df, x='month_name', y=['Income', 'COGS'], 
-                        labels={'value': 'Amount ($)', 'month_name': 'Month'},
-                        barmode='group')
+            st.subheader(f"{BUCKET_TITLES[bucket]} Revenue vs COGS")
+            # Create the bar chart using the period label for the x-axis
+            fig = cached_figure([is_data], start_date, end_date, 'revenue_vs_cogs', lambda: px.bar(
+                merged_df, x='label', y=['Income', 'COGS'],
+                labels={'value': 'Amount ($)', 'label': bucket},
+                barmode='group',
+            ))
 
             st.plotly_chart(fig)
 
             st.markdown('<hr style="height:2px;border:none;color:#333;background-color:#333;" />', unsafe_allow_html=True)
 
             ### Cash Viz
-            cash_data = bs_data_date_filtered.copy()
-
-            # Convert accounting_period_ending to datetime
-            cash_data['accounting_period_ending'] = pd.to_datetime(cash_data['accounting_period_ending'])
-
-            # Filter rows that contain "Cash and Cash Equivalents" in the account_name
-            cash_data = cash_data[cash_data['account_name'].str.lower().str.contains('cash and cash equivalents')]
-
-            # Convert balance column to float
-            cash_data['balance'] = cash_data['balance'].astype(float)
-
-            # Group by accounting_period_ending and sum balances
-            cash_per_period = cash_data.groupby('accounting_period_ending')['balance'].sum().reset_index()
-
-            # Compute y-axis bounds with some buffer
-            y_max = cash_per_period['balance'].max() * 1.1  # 10% above the max
-            y_min = cash_per_period['balance'].min() * 0.9  # 10% below the min
-
-            # Create a plotly line chart
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=cash_per_period['accounting_period_ending'], 
-                                    y=cash_per_period['balance'],
-                                    mode='lines+markers',
-                                    name='Cash Balance'))
-
-            fig.update_layout(xaxis_title="Period Ending",
-                            yaxis_title="Cash Balance",
-                            yaxis=dict(range=[y_min, y_max]),
-                            template="plotly_dark")
+            def cash_figure():
+                # Sum the "Cash and Cash Equivalents" accounts per period
+                cash_series = bs_cube.series(start_date, end_date, name_contains='cash and cash equivalents')
+                cash_per_period = pd.DataFrame({
+                    'accounting_period_ending': pd.to_datetime(cash_series.index),
+                    'balance': cash_series.to_numpy(),
+                })
+
+                # Compute y-axis bounds with some buffer
+                y_max = cash_per_period['balance'].max() * 1.1  # 10% above the max
+                y_min = cash_per_period['balance'].min() * 0.9  # 10% below the min
+
+                # Create a plotly line chart
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(x=cash_per_period['accounting_period_ending'], 
+                                        y=cash_per_period['balance'],
+                                        mode='lines+markers',
+                                        name='Cash Balance'))
+
+                fig.update_layout(xaxis_title="Period Ending",
+                                yaxis_title="Cash Balance",
+                                yaxis=dict(range=[y_min, y_max]),
+                                template="plotly_dark")
+                return fig
+
+            fig = cached_figure([bs_data], start_date, end_date, 'cash_balance', cash_figure)
             st.subheader("Cash Balance by Period")
             st.plotly_chart(fig)
             st.markdown('<hr style="height:2px;border:none;color:#333;background-color:#333;" />', unsafe_allow_html=True)
             st.subheader("Ratios")
 
+            # Margins over the chosen window, with their trend over the trailing periods
+            window = st.radio("Window", list(WINDOWS), format_func=WINDOWS.get, horizontal=True)
+            window_metrics = income_metrics(is_cube, end_date, window, start_date)
+
+            def trend(metric):
+                return metric_trend(is_cube, end_date, metric, window, start_date).dropna().tolist()
+
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric(label="Gross Profit Margin", value=f"{gross_profit_margin:.2f}%", delta=None)
+                st.metric(label="Gross Profit Margin", value=f"{window_metrics.gross_margin:.2f}%", delta=None, chart_data=trend('gross_margin'))
             with col2:
-                st.metric(label="OpEx Ratio", value=f"{opex_ratio:.2%}")
+                st.metric(label="OpEx Ratio", value=f"{window_metrics.opex_ratio:.2%}", chart_data=trend('opex_ratio'))
             with col3:
-                st.metric(label="Operating Profit Margin", value=f"{operating_profit_margin:.2f}%", delta=None)
+                st.metric(label="Operating Profit Margin", value=f"{window_metrics.operating_margin:.2f}%", delta=None, chart_data=trend('operating_margin'))
             with col4:
-                st.metric(label="Net Profit Margin", value=f"{net_profit_margin:.2f}%", delta=None)
+                st.metric(label="Net Profit Margin", value=f"{window_metrics.net_margin:.2f}%", delta=None, chart_data=trend('net_margin'))
 
             st.markdown('---')
 
             ## Ratios
             col3, col4, col5 = st.columns(3)
-            # Compute the Ratios
-            current_ratio = current_assets / current_liabilities if current_liabilities != 0 else 0
-            quick_ratio = (current_assets - inventory) / current_liabilities if current_liabilities != 0 else 0
-            liquid_assets = latest_cash_data['balance'].astype(float).sum()
-            liquidity_ratio = liquid_assets / current_liabilities if current_liabilities != 0 else 0
+            current_ratio = metrics.current_ratio
+            quick_ratio = metrics.quick_ratio
+            liquidity_ratio = metrics.liquidity_ratio
             
             with col3:
                 formatted_current_ratio = "{:,.2f}%".format(current_ratio)
@@ -263,3 +229,5 @@ else:
                 st.metric("Liquidity Ratio", formatted_liquidity_ratio, delta=None, delta_color="normal", help=None, label_visibility="visible")
         else:
             st.warning("Please ensure your starting period is before your ending period.")
+
+record_stage("page_render", time.perf_counter() - page_started, page="executive_dashboard")
@@ -1,11 +1,16 @@
+import time
 import streamlit as st
 import plost
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from functions.filters import date_filter, filter_data
+from functions.filters import date_filter
 from functions.variables import database_schema_variables, destination_selection
 from functions.env_utils import display_sidebar_config
+from functions.instrumentation import record_stage
+from functions.account_tables import account_section, account_table
+from functions.layout import COMPARATIVE_LEVELS, COMPARE_AGAINST, comparative_table
+from functions.report import INCOME_CATEGORIES, balance_sheet
 # from functions.env_utils import setup_snowflake_connection
 
 # Authentication check
@@ -13,6 +18,8 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.warning("Please log in first")
     st.stop()  # This prevents the rest of the page from loading
 
+page_started = time.perf_counter()
+
 # Display Snowflake credentials in the sidebar
 display_sidebar_config()
 
@@ -33,9 +40,6 @@ else:
     if d is not None and len(d) == 2:
         start_date, end_date = d
         if start_date is not None and start_date <= end_date:
-            ## Filter data based on filters applied
-            data_date_filtered = filter_data(start=start_date, end=end_date, data_ref=data)
-
             ## Period specific information
             if start_date == end_date:
                 st.title(f'{start_date.strftime("%b %Y")} period balance sheet')
@@ -43,45 +47,45 @@ else:
                 st.title(f'{start_date.strftime("%b %Y")} to {end_date.strftime("%b %Y")} period balance sheets')
             st.markdown('<hr style="height:2px;border:none;color:#333;background-color:#333;" />', unsafe_allow_html=True)
 
-            ## Create the primary balance sheet view
-            df = data_date_filtered.copy()
-            df = df[~df['account_category'].isin(['Income', 'Expense'])]
-
-            df['formatted_balance'] = df['balance'].apply(lambda x: "${:,.2f}".format(float(x)))
-
-            # Sort unique periods by accounting_period_ending in descending order
-            sorted_periods = sorted(df['accounting_period_ending'].unique(), reverse=True)
-
-            first_run = True
-            for accounting_period in sorted_periods:
-                period_name = df[df['accounting_period_ending'] == accounting_period]['accounting_period_name'].iloc[0]
-                if not first_run:
-                    st.markdown('---')
-                st.title(period_name)  # Use a title to clearly separate each accounting period
-
-                period_data = df[df['accounting_period_ending'] == accounting_period]
-
-                for category in period_data['account_category'].unique():
-                    st.header(category)  # Display the account_category as a header
-
-                    category_data = period_data[period_data['account_category'] == category]
-
-                    for account_type in category_data['account_type_name'].unique():
-                        account_type_data = category_data[category_data['account_type_name'] == account_type]
-
-                        # Calculate the subtotal for the account type
-                        subtotal_account_type = "${:,.2f}".format(account_type_data['balance'].astype(float).sum())
-
-                        # Custom title that includes account type name and its total sum
-                        expander_title = f"{account_type}: {subtotal_account_type}"
+            ## Choose between one block per period and a single side-by-side comparison
+            view = st.radio("View", ["By period", "Comparative"], horizontal=True)
+
+            if view == "Comparative":
+                # Accounts as rows and periods as columns, with variance of the latest period
+                against = st.selectbox("Compare latest period against", list(COMPARE_AGAINST), format_func=COMPARE_AGAINST.get)
+                comparison = comparative_table(data, start_date, end_date, against=against, exclude_categories=INCOME_CATEGORIES)
+                # Subtotal and total rows are marked by the pinned Level column rather than per-row styling,
+                # so the cached table is rendered as is on every rerun
+                st.dataframe(comparison, hide_index=True, width="stretch", column_config={
+                    'Level': st.column_config.TextColumn("Level", pinned=True, help=" / ".join(COMPARATIVE_LEVELS.values())),
+                    'Account': st.column_config.TextColumn("Account", pinned=True),
+                })
+            else:
+                ## Create the primary balance sheet view
+                # Periods, categories, account types and their subtotals are grouped in a single pass, latest period first
+                first_run = True
+                for period in balance_sheet(data, start_date, end_date):
+                    if not first_run:
+                        st.markdown('---')
+                    st.title(period.name)  # Use a title to clearly separate each accounting period
+
+                    for category in period.categories:
+                        st.header(category.name)  # Display the account_category as a header
+
+                        for account_type in category.account_types:
+                            # Custom title that includes account type name and its total sum
+                            expander_title = f"{account_type.name}: {account_type.formatted_total}"
                         
-                        # Create an expander for each account_type_name within the account_category
-                        with st.expander(expander_title):
-                            st.table(account_type_data[['account_name', 'formatted_balance']])
+                            # Create an expander for each account_type_name within the account_category
+                            section_key = f"bs_{period.ending}_{category.name}_{account_type.name}"
+                            with account_section(expander_title, key=section_key) as opened:
+                                if opened:
+                                    account_table(account_type.accounts, key=section_key + "_page")
 
                         # Display the subtotal for the category
-                        subtotal = "${:,.2f}".format(category_data['balance'].astype(float).sum())
-                    st.write(f"**Total {category}:** {subtotal}")
-                first_run = False
+                        st.write(f"**Total {category.name}:** {category.formatted_total}")
+                    first_run = False
         else:
             st.warning("Please ensure your starting period is before your ending period.")
+
+record_stage("page_render", time.perf_counter() - page_started, page="balance_sheet")
@@ -1,12 +1,16 @@
+import time
 import streamlit as st
 import plost
 import pandas as pd
 import numpy as np
 import plotly.express as px
 from datetime import datetime
-from functions.filters import date_filter, filter_data
+from functions.filters import date_filter
 from functions.variables import database_schema_variables, destination_selection
 from functions.env_utils import display_sidebar_config
+from functions.instrumentation import record_stage
+from functions.account_tables import account_section, account_table
+from functions.report import profit_and_loss
 # from functions.query import query_results
 # from functions.env_utils import setup_snowflake_connection
 
@@ -15,6 +19,8 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.warning("Please log in first")
     st.stop()  # This prevents the rest of the page from loading
 
+page_started = time.perf_counter()
+
 # Display Snowflake credentials in the sidebar
 display_sidebar_config()
 
@@ -33,8 +39,8 @@ else:
     if d is not None and len(d) == 2:
         start_date, end_date = d
         if start_date is not None and start_date <= end_date:
-            ## Filter data based on filters applied
-            data_date_filtered = filter_data(start=start_date, end=end_date, data_ref=data, model='is')
+            # Sections, subtotals and net profit of the range, computed outside Streamlit
+            report = profit_and_loss(data, start_date, end_date)
 
             ## Period specific information
             if start_date == end_date:
@@ -45,42 +51,29 @@ else:
             st.markdown('---')
             ## Create the primary income statement view
             # st.subheader("Profit and Loss Statement")
-            df = data_date_filtered.copy()
-            
-            df['formatted_balance'] = df['balance'].apply(lambda x: "${:,.2f}".format(x))
-            for category in df['account_category'].unique():
-                # st.subheader(category)
-                
-                category_data = df[df['account_category'] == category]
-                st.subheader(f"**{category}**")
+            # Categories, account types and their subtotals are grouped in a single pass
+            for category in report.categories:
+                st.subheader(f"**{category.name}**")
                 # Expansion for different account types under the category
-                for account_type in category_data['account_type_name'].unique():
-                    account_type_data = category_data[category_data['account_type_name'] == account_type]
-                    
-                    # Calculate the subtotal for the account type
-                    subtotal_account_type = "${:,.2f}".format(account_type_data['balance'].sum())
-
+                for account_type in category.account_types:
                     # Custom title that includes account type name and its total sum
-                    expander_title = f"**{account_type}**: {subtotal_account_type}"
+                    expander_title = f"**{account_type.name}**: {account_type.formatted_total}"
                     
-                    with st.expander(expander_title):  # User can collapse/expand data for each account type
-                        st.table(account_type_data[['account_name', 'formatted_balance']])
+                    section_key = f"pl_{category.name}_{account_type.name}"
+                    with account_section(expander_title, key=section_key) as opened:  # User can collapse/expand data for each account type
+                        if opened:
+                            account_table(account_type.accounts, key=section_key + "_page")
                         
-                        # Display the subtotal for the account type inside the expander as well (optional)
-                        st.write(f"**Total {account_type}:** {subtotal_account_type}")
+                            # Display the subtotal for the account type inside the expander as well (optional)
+                            st.write(f"**Total {account_type.name}:** {account_type.formatted_total}")
 
                 # Display the subtotal for the category
-                subtotal = "${:,.2f}".format(category_data['balance'].sum())
-                st.write(f"**Total {category}:** {subtotal}")
+                st.write(f"**Total {category.name}:** {category.formatted_total}")
             
-            revenue = df[df['account_category'] == 'Income']['balance'].sum()
-            exp = df[df['account_category'] == 'Expense']['balance'].sum()
-
-            # Calculate Gross Margin
-            gross_margin = revenue - exp * - 1
-
-            # Display Gross Margin
+            # Display Net Profit
             st.subheader("Net Profit")
-            st.write("${:,.2f}".format(gross_margin))
+            st.write("${:,.2f}".format(report.net_profit))
         else:
             st.warning("Please ensure your starting period is before your ending period.")
+
+record_stage("page_render", time.perf_counter() - page_started, page="profit_and_loss")
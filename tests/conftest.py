@@ -0,0 +1,38 @@
+import os
+
+import pandas as pd
+import pytest
+
+from functions.normalise import normalise_frame
+from functions.query import _prepare_dates
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def read_sample(name):
+    """
+    Reads a bundled sample CSV with its period endings converted to dates, as the app loads it.
+    """
+    return _prepare_dates(pd.read_csv(os.path.join(DATA, f"dunder_mifflin_{name}.csv")))
+
+
+# Sample frames are shared by every test and must not be modified in place
+
+@pytest.fixture(scope="session")
+def bs_raw():
+    return read_sample('balance_sheet')
+
+
+@pytest.fixture(scope="session")
+def is_raw():
+    return read_sample('income_statement')
+
+
+@pytest.fixture(scope="session")
+def bs_data(bs_raw):
+    return normalise_frame(bs_raw)
+
+
+@pytest.fixture(scope="session")
+def is_data(is_raw):
+    return normalise_frame(is_raw)
@@ -0,0 +1,69 @@
+import pytest
+
+from functions import account_tables
+
+
+class FakeStreamlit:
+    """
+    Records the tables Streamlit would render, answering page inputs with a fixed page.
+    """
+
+    def __init__(self, page=1, toggled=False):
+        self.page = page
+        self.toggled = toggled
+        self.calls = []
+
+    def table(self, frame):
+        self.calls.append(('table', frame))
+
+    def dataframe(self, frame, **kwargs):
+        self.calls.append(('dataframe', frame))
+
+    def caption(self, text):
+        self.calls.append(('caption', text))
+
+    def number_input(self, label, min_value, max_value, value, step, key):
+        self.calls.append(('number_input', label))
+        return self.page
+
+    def toggle(self, label, key):
+        return self.toggled
+
+
+@pytest.fixture
+def accounts(bs_raw):
+    return bs_raw.groupby('account_name', as_index=False)['balance'].sum()
+
+
+def test_short_lists_render_as_one_table(monkeypatch, accounts):
+    fake = FakeStreamlit()
+    monkeypatch.setattr(account_tables, 'st', fake)
+    monkeypatch.setenv("ACCOUNT_TABLE_PAGE_SIZE", str(len(accounts)))
+
+    account_tables.account_table(accounts, key='accounts')
+    (kind, frame), = fake.calls
+    assert kind == 'table'
+    assert list(frame['account_name']) == list(accounts['account_name'])
+    assert list(frame['formatted_balance']) == ["${:,.2f}".format(b) for b in accounts['balance']]
+
+
+def test_long_lists_render_one_page(monkeypatch, accounts):
+    fake = FakeStreamlit(page=2)
+    monkeypatch.setattr(account_tables, 'st', fake)
+    monkeypatch.setenv("ACCOUNT_TABLE_PAGE_SIZE", "5")
+
+    account_tables.account_table(accounts, key='accounts')
+    pages = -(-len(accounts) // 5)
+    assert fake.calls[0] == ('number_input', f"Page (of {pages})")
+    kind, frame = fake.calls[1]
+    assert kind == 'dataframe'
+    assert list(frame['account_name']) == list(accounts['account_name'].iloc[5:10])
+    assert list(frame['formatted_balance']) == ["${:,.2f}".format(b) for b in accounts['balance'].iloc[5:10]]
+    assert fake.calls[2] == ('caption', f"Accounts 6 to 10 of {len(accounts)}")
+
+
+def test_lazy_sections_skip_their_body_until_toggled(monkeypatch):
+    monkeypatch.setenv("LAZY_ACCOUNT_TABLES", "true")
+    monkeypatch.setattr(account_tables, 'st', FakeStreamlit(toggled=False))
+    with account_tables.account_section("Assets", key='assets') as shown:
+        assert shown is False
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from functions.arrow_fetch import FakeArrowConnection, FakeArrowCursor, frame_from_arrow, table_from_batches
+from functions.connection_pool import SnowflakeConnectionPool
+
+PARAMS = {"account": "acme", "user": "jane", "password": "secret", "role": "REPORTING"}
+
+
+def _report(rows):
+    return pd.DataFrame({
+        'accounting_period_name': ['Oct 2023'] * rows,
+        'accounting_period_ending': pd.to_datetime(['2023-10-31'] * rows),
+        'account_name': ['Income : Revenue'] * rows,
+        'balance': [1.5] * rows,
+    })
+
+
+def test_result_without_batches_keeps_column_names():
+    cursor = FakeArrowCursor(FakeArrowConnection.from_frame(_report(0)).table)
+    assert list(cursor.fetch_arrow_batches()) == []
+
+    frame = frame_from_arrow(table_from_batches(cursor.fetch_arrow_batches()), cursor.description)
+    assert frame.empty
+    assert list(frame.columns) == ['accounting_period_name', 'accounting_period_ending', 'account_name', 'balance']
+
+
+def test_pooled_query_with_no_rows():
+    pool = SnowflakeConnectionPool(connect=lambda **params: FakeArrowConnection.from_frame(_report(0), **params))
+    with pool.acquire(PARAMS) as conn:
+        frame = conn.query("select 1", arrow=True)
+    assert frame.empty
+    assert 'accounting_period_ending' in frame.columns
+
+
+def test_pooled_query_with_rows():
+    pool = SnowflakeConnectionPool(connect=lambda **params: FakeArrowConnection.from_frame(_report(3), **params))
+    with pool.acquire(PARAMS) as conn:
+        frame = conn.query("select 1", arrow=True)
+    assert len(frame) == 3
+    assert frame['account_name'].dtype == 'category'
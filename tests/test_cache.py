@@ -0,0 +1,17 @@
+import pandas as pd
+
+from functions.cache import ResultCache, ResultKey
+
+KEY = ResultKey("Snowflake", "DB", "SCHEMA", "bs", 1, "REPORTING")
+
+
+def test_counted_peek_records_hits_and_misses():
+    cache = ResultCache(ttl_seconds=1)
+    assert cache.peek(KEY, count=True) is None
+    cache.put(KEY, pd.DataFrame({'balance': [1.0]}), fetched_at=0)
+
+    # Expired entries are still returned, and counted as hits
+    entry = cache.peek(KEY, count=True)
+    cache.peek(KEY)
+    assert entry is not None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
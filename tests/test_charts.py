@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.charts import _buckets, revenue_vs_cogs
+
+ENDINGS = pd.Series(pd.date_range('2021-01-31', periods=36, freq='ME'))
+
+
+def test_months_within_the_limit():
+    buckets, labels, unit = _buckets(ENDINGS[:12], 24)
+    assert unit == 'Month'
+    assert list(labels) == list(ENDINGS[:12].dt.strftime('%B'))
+    assert list(buckets) == sorted(buckets)
+
+    # Month names carry the year once the range spans more than one
+    _, labels, _ = _buckets(ENDINGS[:24], 24)
+    assert labels[0] == 'Jan 2021' and labels[-1] == 'Dec 2022'
+
+
+def test_quarters_and_years_over_long_ranges():
+    buckets, labels, unit = _buckets(ENDINGS, 24)
+    assert unit == 'Quarter'
+    assert list(pd.unique(labels)) == [f"Q{q} {y}" for y in (2021, 2022, 2023) for q in (1, 2, 3, 4)]
+    assert len(np.unique(buckets)) == ENDINGS.dt.to_period('Q').nunique()
+
+    buckets, labels, unit = _buckets(ENDINGS, 6)
+    assert unit == 'Year'
+    assert list(buckets) == list(ENDINGS.dt.year)
+    assert list(pd.unique(labels)) == ['2021', '2022', '2023']
+
+
+@pytest.mark.parametrize("max_points, unit", [(24, 'Month'), (3, 'Quarter'), (1, 'Year')])
+def test_revenue_vs_cogs_matches_pandas(max_points, unit, is_raw, is_data):
+    endings = sorted(is_raw['accounting_period_ending'].unique())
+    chart, bucket = revenue_vs_cogs(is_data, endings[0], endings[-1], max_points=max_points)
+    assert bucket == unit
+
+    rows = is_raw.assign(
+        key=pd.to_datetime(is_raw['accounting_period_ending']).dt.to_period(unit[0]),
+        amount=is_raw['balance'].abs(),
+    )
+    income = rows[rows['account_category'] == 'Income'].groupby('key')['amount'].sum()
+    cogs = rows[rows['account_type_name'] == 'Cost of Goods Sold'].groupby('key')['amount'].sum()
+    expected = pd.concat([income.rename('Income'), cogs.rename('COGS')], axis=1, join='inner').sort_index()
+
+    assert list(chart['Income']) == pytest.approx(list(expected['Income']))
+    assert list(chart['COGS']) == pytest.approx(list(expected['COGS']))
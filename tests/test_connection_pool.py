@@ -0,0 +1,58 @@
+import time
+
+from functions.connection_pool import SnowflakeConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(**kwargs):
+    opened = []
+
+    def connect(**params):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return SnowflakeConnectionPool(connect=connect, **kwargs), opened
+
+
+def test_connections_are_reused_per_credentials():
+    pool, opened = _pool()
+    with pool.acquire({'user': 'a'}):
+        pass
+    with pool.acquire({'user': 'a'}):
+        pass
+    assert len(opened) == 1 and pool.stats()["idle"] == 1
+
+
+def test_full_pool_closes_the_least_recently_used_idle_connection():
+    pool, opened = _pool(max_total=2)
+    for user in ('a', 'b', 'c'):
+        with pool.acquire({'user': user}):
+            pass
+    assert [conn.closed for conn in opened] == [True, False, False]
+    assert pool.stats()["idle"] == 2
+
+
+def test_connections_leased_during_close_all_are_closed_on_return():
+    pool, opened = _pool()
+    conn = pool.acquire({'user': 'a'})
+    pool.close_all()
+    pool.release(conn)
+    assert opened[0].closed and pool.stats()["idle"] == 0
+
+
+def test_idle_connections_are_closed_without_new_leases():
+    pool, opened = _pool(idle_timeout=0, health_check_interval=0)
+    with pool.acquire({'user': 'a'}):
+        pass
+    time.sleep(1.5)
+    assert opened[0].closed and pool.stats()["idle"] == 0
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from functions.cube import cube_for
+
+
+def _endings(raw):
+    return sorted(raw['accounting_period_ending'].unique())
+
+
+def _between(raw, start, end):
+    return raw[(raw['accounting_period_ending'] >= start) & (raw['accounting_period_ending'] <= end)]
+
+
+@pytest.mark.parametrize("model", ['bs', 'is'])
+def test_totals_match_pandas(model, bs_raw, is_raw, bs_data, is_data):
+    raw, data = (bs_raw, bs_data) if model == 'bs' else (is_raw, is_data)
+    cube = cube_for(data)
+    endings = _endings(raw)
+    for start, end in [(endings[0], endings[-1]), (endings[1], endings[3]), (endings[-1], endings[-1])]:
+        rows = _between(raw, start, end)
+        assert cube.total(start, end) == pytest.approx(rows['balance'].sum())
+        for category, expected in rows.groupby('account_category')['balance'].sum().items():
+            assert cube.total(start, end, category=category.upper()) == pytest.approx(expected)
+
+
+def test_rollups_and_series_match_pandas(bs_raw, bs_data):
+    cube = cube_for(bs_data)
+    endings = _endings(bs_raw)
+    start, end = endings[1], endings[-1]
+    rows = _between(bs_raw, start, end)
+
+    rolled = cube.rollup(start, end, level='account_type')
+    expected = rows.groupby(['account_category', 'account_type_name'])['balance'].sum()
+    actual = rolled.set_index(['account_category', 'account_type_name'])['balance'].astype(float)
+    assert actual.sort_index().to_numpy() == pytest.approx(expected.sort_index().to_numpy())
+
+    cash = rows[rows['account_name'].str.lower().str.contains('cash and cash equivalents')]
+    series = cube.series(start, end, name_contains='Cash and Cash Equivalents')
+    assert list(series.index) == endings[1:]
+    assert series.to_numpy() == pytest.approx(cash.groupby('accounting_period_ending')['balance'].sum().reindex(endings[1:], fill_value=0).to_numpy())
+    assert cube.total_matching('cash and cash equivalents', start, end) == pytest.approx(cash['balance'].sum())
+
+
+def test_period_matrix_and_prefix_totals(is_raw, is_data):
+    cube = cube_for(is_data)
+    endings = _endings(is_raw)
+    members, balances = cube.period_matrix(endings[0], endings[2], level='category')
+    expected = is_raw[is_raw['accounting_period_ending'] <= endings[2]].pivot_table(
+        index='account_category', columns='accounting_period_ending', values='balance', aggfunc='sum', fill_value=0)
+    assert balances.shape == (len(members), 3)
+    assert balances == pytest.approx(expected.loc[members['account_category'].astype(str)].to_numpy())
+
+    totals = cube.prefix_totals(category='income')
+    lo, hi = cube.period_slice(endings[1], endings[-1])
+    assert totals[hi] - totals[lo] == pytest.approx(cube.total(endings[1], endings[-1], category='Income'))
+
+
+def test_empty_ranges(bs_data, bs_raw):
+    cube = cube_for(bs_data)
+    endings = _endings(bs_raw)
+    assert cube.total(endings[-1], endings[0]) == 0.0
+    assert cube.latest_period(endings[-1], endings[0]) is None
+    assert cube.latest_period(endings[0], endings[-1]) == endings[-1]
+    assert np.isclose(cube.rollup(endings[-1], endings[0])['balance'], 0).all()
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from functions.figures import FigureCache, cached_figure, dataset_version, get_figure_cache
+
+
+class FakeFigure:
+    def __init__(self, size):
+        self.size = size
+
+    def to_json(self):
+        return "x" * self.size
+
+
+def test_hits_and_misses():
+    cache = FigureCache(max_bytes=1000)
+    built = []
+    first = cache.get_or_build('a', lambda: built.append(1) or FakeFigure(10))
+    assert cache.get_or_build('a', lambda: built.append(1) or FakeFigure(10)) is first
+    assert built == [1]
+    assert cache.stats() == {"entries": 1, "bytes": 10, "max_bytes": 1000, "hits": 1, "misses": 1}
+
+
+def test_evicts_least_recently_used_past_the_budget():
+    cache = FigureCache(max_bytes=100)
+    cache.get_or_build('a', lambda: FakeFigure(40))
+    cache.get_or_build('b', lambda: FakeFigure(40))
+    cache.get_or_build('a', lambda: FakeFigure(40))
+    cache.get_or_build('c', lambda: FakeFigure(40))
+    assert list(cache._entries) == ['a', 'c']
+    assert cache.stats()["bytes"] == 80
+
+    # Figures larger than the whole budget are returned but never cached
+    big = cache.get_or_build('d', lambda: FakeFigure(500))
+    assert big.size == 500 and 'd' not in cache._entries
+
+
+def test_figures_are_keyed_by_dataset_version():
+    frame = pd.DataFrame({'balance': [1.0, 2.0]})
+    assert dataset_version(frame) == dataset_version(frame)
+    reloaded = frame.copy()
+    assert dataset_version(reloaded) != dataset_version(frame)
+
+    first = cached_figure([frame], 'start', 'end', 'test_chart', lambda: FakeFigure(5))
+    assert cached_figure([frame], 'start', 'end', 'test_chart', lambda: FakeFigure(5)) is first
+    assert cached_figure([reloaded], 'start', 'end', 'test_chart', lambda: FakeFigure(5)) is not first
+    assert cached_figure([frame], 'start', 'other', 'test_chart', lambda: FakeFigure(5)) is not first
+    assert get_figure_cache() is get_figure_cache()
@@ -0,0 +1,48 @@
+import datetime
+
+import pandas as pd
+
+from functions.hierarchy import hierarchy_for, split_levels
+
+PERIODS = [datetime.date(2023, 1, 31), datetime.date(2023, 2, 28)]
+
+
+def _report(names, category='Expense'):
+    rows = [
+        {
+            'accounting_period_ending': ending,
+            'accounting_period_name': ending.strftime('%b %Y'),
+            'account_category': category,
+            'account_type_name': 'Expense',
+            'account_name': name,
+            'balance': -10.0 * (position + 1),
+        }
+        for ending in PERIODS
+        for position, name in enumerate(names)
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_split_levels():
+    levels = split_levels(['Expense : Payroll : Bonus', 'Expense : IT', 'Rounding'])
+    assert list(levels.columns) == ['level_1', 'level_2', 'level_3']
+    assert levels.iloc[0].tolist() == ['Expense', 'Payroll', 'Bonus']
+    assert levels.iloc[1].tolist()[:2] == ['Expense', 'IT']
+    assert pd.isna(levels.iloc[2]['level_2'])
+
+
+def test_rollup_by_second_level():
+    hierarchy = hierarchy_for(_report(['Expense : Payroll', 'Expense : IT', 'Expense : IT']))
+    rolled = hierarchy.rollup(PERIODS[0], PERIODS[1], depth=2, category='expense')
+    assert dict(zip(rolled['name'], rolled['balance'])) == {'IT': -100.0, 'Payroll': -20.0}
+    assert hierarchy.children(('Expense', 'Expense')) == ['IT', 'Payroll']
+
+
+def test_flat_account_names():
+    hierarchy = hierarchy_for(_report(['Payroll', 'IT']))
+    assert hierarchy.depth == 1
+
+    # Depths past the hierarchy's fall back to its deepest level instead of failing
+    rolled = hierarchy.rollup(PERIODS[0], PERIODS[1], depth=2, category='Expense')
+    assert dict(zip(rolled['name'], rolled['balance'])) == {'IT': -40.0, 'Payroll': -20.0}
+    assert hierarchy.total(('Expense', 'Payroll', 'Bonus')) == 0.0
@@ -0,0 +1,73 @@
+import datetime
+
+import pandas as pd
+
+from functions.cache import ResultCache, ResultKey
+from functions.incremental import IncrementalStore
+from functions.normalise import normalise_frame
+
+KEY = ResultKey("Snowflake", "DB", "SCHEMA", "bs", 1, "REPORTING")
+OCT, NOV = datetime.date(2023, 10, 31), datetime.date(2023, 11, 30)
+
+
+def _rows(periods):
+    return pd.DataFrame({'accounting_period_ending': periods, 'balance': [1.0] * len(periods)})
+
+
+def _watermarks():
+    return pd.DataFrame({'accounting_period_ending': [OCT, NOV], 'row_count': [1, 1], 'amount': [1.0, 1.0]})
+
+
+def _load(store, fetch_periods):
+    # As query._load does: the merged frame is normalised and cached under the report's key
+    frame = normalise_frame(store.load(KEY, _watermarks, fetch_periods))
+    store.cache.put(KEY, frame)
+    return frame
+
+
+def test_only_watermarks_are_kept_next_to_the_cached_frame():
+    cache = ResultCache(max_bytes=0)
+    store = IncrementalStore(cache, recent_periods=1)
+    _load(store, lambda periods: _rows([OCT, NOV]))
+    assert store.get(KEY) == {OCT: (1, 1.0), NOV: (1, 1.0)}
+    assert cache.stats()["bytes"] == cache.peek(KEY).nbytes
+
+
+def test_refresh_only_fetches_recent_periods_until_invalidated():
+    store = IncrementalStore(ResultCache(max_bytes=0), recent_periods=1)
+    fetched = []
+
+    def fetch_periods(periods):
+        fetched.append(periods)
+        return _rows(periods or [OCT, NOV])
+
+    _load(store, fetch_periods)
+    frame = _load(store, fetch_periods)
+    assert fetched == [None, [NOV]]
+    assert len(frame) == 2 and frame['accounting_period_ending'].dtype == 'datetime64[s]'
+
+    # Refresh Data invalidates the result cache with a predicate on the report key
+    store.cache.invalidate(lambda key: key.accounting_book_id == 1 and key.role in ("REPORTING", None))
+    _load(store, fetch_periods)
+    assert fetched[-1] is None
+
+
+def test_evicted_frames_are_fetched_again():
+    store = IncrementalStore(ResultCache(max_bytes=0), recent_periods=1)
+    fetched = []
+
+    def fetch_periods(periods):
+        fetched.append(periods)
+        return _rows(periods or [OCT, NOV])
+
+    _load(store, fetch_periods)
+    store.cache.invalidate(lambda key: key == KEY)
+    _load(store, fetch_periods)
+    assert fetched == [None, None]
+
+
+def test_watermarks_seeded_from_snapshots_keep_unchanged_periods():
+    store = IncrementalStore(ResultCache(max_bytes=0), recent_periods=1)
+    store.cache.put(KEY, normalise_frame(_rows([OCT, NOV])))
+    store.put(KEY, {OCT: (1, 1.0), NOV: (1, 1.0)})
+    assert len(_load(store, lambda periods: _rows(periods))) == 2
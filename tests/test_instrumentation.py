@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from functions.instrumentation import StageRecorder, frame_stats, get_stage_recorder, sample_dict, timed_stage
+
+SECONDS = [0.001 * i for i in range(1, 21)]
+
+
+def _recorder():
+    recorder = StageRecorder(max_samples=10)
+    for i, seconds in enumerate(SECONDS):
+        recorder.record("fetch", seconds, rows=10, nbytes=100, cache="hit" if i % 4 else "miss", model="bs")
+    recorder.record("render", 0.5)
+    return recorder
+
+
+def test_summary_percentiles_and_totals():
+    fetch, render = _recorder().summary()
+    # Percentiles cover the retained samples, totals every sample recorded
+    assert fetch["stage"] == "fetch" and fetch["count"] == 20
+    assert fetch["p50_ms"] == round(float(np.percentile(SECONDS[-10:], 50)) * 1000, 2)
+    assert fetch["p95_ms"] == round(float(np.percentile(SECONDS[-10:], 95)) * 1000, 2)
+    assert fetch["total_s"] == round(sum(SECONDS), 3)
+    assert (fetch["rows"], fetch["bytes"]) == (200, 2000)
+    assert fetch["cache_hit_ratio"] == 0.75
+    assert render["cache_hit_ratio"] is None and render["rows"] == 0
+
+
+def test_prometheus_text():
+    text = _recorder().prometheus_text()
+    assert 'netsuite_stage_seconds_count{stage="fetch"} 20' in text
+    assert 'netsuite_stage_rows_total{stage="fetch"} 200' in text
+    assert 'netsuite_stage_cache_total{stage="fetch",result="hit"} 15' in text
+    assert 'netsuite_stage_cache_total{stage="render"' not in text
+    assert text.endswith("\n")
+
+
+def test_reset_and_sample_dict():
+    recorder = _recorder()
+    record = sample_dict(recorder.samples()[-1])
+    assert record["stage"] == "render" and record["ms"] == 500.0
+    assert sample_dict(recorder.samples()[0])["model"] == "bs"
+    recorder.reset()
+    assert recorder.summary() == [] and recorder.samples() == []
+
+
+def test_timed_stage_records_even_when_the_block_raises():
+    recorder = get_stage_recorder()
+    recorder.reset()
+    with pytest.raises(RuntimeError):
+        with timed_stage("failing", model="is") as sample:
+            sample.update(rows=3, cache="miss")
+            raise RuntimeError("boom")
+    sample, = recorder.samples()
+    assert (sample.stage, sample.rows, sample.cache, sample.labels) == ("failing", 3, "miss", {"model": "is"})
+    recorder.reset()
+
+
+def test_frame_stats_match_pandas(bs_data):
+    stats = frame_stats(bs_data)
+    assert stats == {"rows": len(bs_data), "nbytes": int(bs_data.memory_usage(index=False).sum())}
@@ -0,0 +1,52 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from functions.layout import format_currency, period_layouts, statement_layout
+from functions.normalise import normalise_frame
+
+OCT, NOV = datetime.date(2023, 10, 31), datetime.date(2023, 11, 30)
+
+
+def _report():
+    return pd.DataFrame({
+        'accounting_period_ending': [OCT, OCT, NOV, OCT, NOV],
+        'accounting_period_name': ['Oct 2023', 'Oct 2023', 'Nov 2023', 'Oct 2023', 'Nov 2023'],
+        'account_category': ['Asset', 'Liability', 'Asset', 'Asset', 'Asset'],
+        'account_type_name': ['Bank', 'Payable', 'Bank', 'Bank', 'Bank'],
+        'account_name': ['Checking', 'Trade Payables', 'Checking', 'Savings', 'Savings'],
+        'balance': [100.0, -40.0, 110.0, 5.5, 6.0],
+    })
+
+
+def test_format_currency():
+    assert list(format_currency([1234.5, -0.25, np.nan])) == ['$1,234.50', '$-0.25', '$nan']
+
+
+def test_statement_layout():
+    categories = statement_layout(_report())
+    assert [category.name for category in categories] == ['Asset', 'Liability']
+    bank = categories[0].account_types[0]
+    assert bank.formatted_total == '$221.50'
+    assert list(bank.accounts['account_name']) == ['Checking', 'Checking', 'Savings', 'Savings']
+
+
+def test_period_layouts_latest_first():
+    layouts = period_layouts(_report())
+    assert [layout.name for layout in layouts] == ['Nov 2023', 'Oct 2023']
+    october = layouts[1]
+    assert [category.formatted_total for category in october.categories] == ['$105.50', '$-40.00']
+    assert list(october.categories[0].account_types[0].accounts['balance']) == [100.0, 5.5]
+
+
+def test_rows_with_missing_keys_are_left_out():
+    report = _report()
+    report.loc[0, 'account_type_name'] = None
+    report.loc[4, 'accounting_period_ending'] = None
+    for frame in (report, normalise_frame(report)):
+        categories = {category.name: category for category in statement_layout(frame)}
+        assert [account_type.name for account_type in categories['Asset'].account_types] == ['Bank']
+        assert list(categories['Asset'].account_types[0].accounts['account_name']) == ['Checking', 'Savings', 'Savings']
+        october = {category.name: category for category in period_layouts(frame)[1].categories}
+        assert list(october['Asset'].account_types[0].accounts['balance']) == [5.5]
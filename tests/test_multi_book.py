@@ -0,0 +1,35 @@
+import pandas as pd
+
+from functions import query
+from functions.cache import ResultCache, ResultKey
+from functions.normalise import normalise_frame
+
+KEY = ResultKey("Snowflake", "DB", "SCHEMA", "is", 3, "REPORTING")
+
+
+def test_books_are_split_and_empty_books_cached(monkeypatch, is_raw):
+    cache = ResultCache(max_bytes=0)
+    monkeypatch.setattr(query, 'get_result_cache', lambda: cache)
+    monkeypatch.delenv("SNAPSHOT_DIR", raising=False)
+
+    # Book 1 holds the income accounts and book 3 the rest; book 2 has no rows at all
+    rows = is_raw.assign(accounting_book_id=(is_raw['account_category'] == 'Income').map({True: 1, False: 3}))
+    statements = []
+
+    def fetch(statement):
+        statements.append(statement)
+        return rows
+
+    data = query._load_books("Snowflake", "DB", "SCHEMA", "is", KEY, fetch)
+    assert len(statements) == 1
+
+    expected = is_raw[is_raw['account_category'] != 'Income'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(data, expected)
+
+    other = cache.peek(KEY._replace(accounting_book_id=1)).value
+    income = is_raw[is_raw['account_category'] == 'Income'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(other, normalise_frame(income))
+
+    empty = cache.peek(KEY._replace(accounting_book_id=2)).value
+    assert empty.empty
+    assert list(empty.columns) == list(other.columns)
@@ -0,0 +1,36 @@
+import datetime
+
+import pandas as pd
+
+from functions.normalise import normalise_frame
+from functions.period_index import PeriodIndex
+
+OCT, NOV = datetime.date(2023, 10, 31), datetime.date(2023, 11, 30)
+
+
+def test_period_endings_are_stored_as_datetimes():
+    frame = normalise_frame(pd.DataFrame({
+        'accounting_period_name': ["Nov 2023", "Oct 2023", "Nov 2023"],
+        'accounting_period_ending': [NOV, OCT, NOV],
+        'balance': [1, 2, 3],
+    }))
+    assert frame['accounting_period_ending'].dtype == 'datetime64[s]'
+    assert list(frame['period_key']) == [20231130, 20231031, 20231130]
+
+    # Lookups still take and return dates
+    index = PeriodIndex(frame)
+    assert index.endings == [OCT, NOV]
+    assert list(index.positions(NOV, NOV)) == [0, 2]
+
+
+def test_period_names_are_ordered_chronologically(is_raw):
+    frame = normalise_frame(is_raw)
+    expected = is_raw.drop_duplicates('accounting_period_name').sort_values('accounting_period_ending')
+    assert list(frame['accounting_period_name'].cat.categories) == list(expected['accounting_period_name'])
+
+    # Frames merged from separate loads keep the order once normalised again
+    endings = sorted(is_raw['accounting_period_ending'].unique())
+    recent = is_raw['accounting_period_ending'] >= endings[3]
+    merged = pd.concat([normalise_frame(is_raw[recent]), normalise_frame(is_raw[~recent])], ignore_index=True)
+    merged = normalise_frame(merged)
+    assert list(merged['accounting_period_name'].cat.categories) == list(expected['accounting_period_name'])
@@ -0,0 +1,31 @@
+import numpy as np
+
+from functions.period_index import period_index_for
+
+
+def test_periods_match_pandas(bs_raw, bs_data):
+    index = period_index_for(bs_data)
+    periods = bs_raw[['accounting_period_ending', 'accounting_period_name']].drop_duplicates().sort_values('accounting_period_ending')
+    assert index.endings == list(periods['accounting_period_ending'])
+    assert index.names_descending() == list(periods['accounting_period_name'])[::-1]
+    assert index.latest() == periods['accounting_period_ending'].max()
+    for ending, name in zip(periods['accounting_period_ending'], periods['accounting_period_name']):
+        assert index.name_for(ending) == name and index.ending_for(name) == ending
+
+
+def test_positions_select_the_range_in_frame_order(bs_raw, bs_data):
+    index = period_index_for(bs_data)
+    endings = index.endings
+    for start, end in [(endings[0], endings[-1]), (endings[1], endings[2]), (endings[3], endings[3])]:
+        expected = np.flatnonzero(((bs_raw['accounting_period_ending'] >= start) & (bs_raw['accounting_period_ending'] <= end)).to_numpy())
+        assert list(index.positions(start, end)) == list(expected)
+        lo, hi = index.period_slice(start, end)
+        assert index.endings[lo:hi] == [ending for ending in endings if start <= ending <= end]
+
+
+def test_empty_and_reversed_ranges(bs_data):
+    index = period_index_for(bs_data)
+    endings = index.endings
+    assert len(index.positions(endings[-1], endings[0])) == 0
+    lo, hi = index.period_slice(endings[-1], endings[0])
+    assert lo == hi
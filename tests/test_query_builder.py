@@ -0,0 +1,48 @@
+import datetime
+import json
+
+import pytest
+
+from functions.query_builder import books_report_statement, periods_statement, report_statement, watermark_statement
+
+OCT, NOV = datetime.date(2023, 10, 31), datetime.date(2023, 11, 30)
+
+
+def test_snowflake_report_binds_every_value():
+    statement = report_statement("Snowflake", "DB", "SCHEMA", 'bs', 2, start=OCT, end=NOV, categories=['Asset'])
+    assert statement.sql.count("?") == len(statement.params)
+    assert statement.positional() == ["DB.SCHEMA.netsuite2__balance_sheet", 2, OCT, NOV, json.dumps(["Asset"])]
+    assert "DB.SCHEMA" not in statement.sql and "Asset" not in statement.sql
+    assert statement.sql.endswith("order by balance_sheet_sort_helper")
+
+
+def test_bigquery_report_uses_named_parameters():
+    statement = report_statement("BigQuery", "DB", "SCHEMA", 'is', 1, periods=[OCT, NOV])
+    assert "`DB.SCHEMA.netsuite2__income_statement`" in statement.sql
+    assert "unnest(@periods)" in statement.sql and "@accounting_book_id" in statement.sql
+    assert dict(statement.params) == {'accounting_book_id': 1, 'periods': (OCT, NOV)}
+
+
+def test_statement_text_does_not_depend_on_values():
+    first = report_statement("Snowflake", "DB", "SCHEMA", 'bs', 1, periods=[OCT])
+    second = report_statement("Snowflake", "DB", "SCHEMA", 'bs', 2, periods=[OCT, NOV])
+    assert first.sql == second.sql and first.cache_key() != second.cache_key()
+
+
+def test_projection_keeps_the_sort_helper_and_groups_every_dimension():
+    statement = report_statement("BigQuery", "DB", "SCHEMA", 'bs', 1, columns=['account_name'])
+    assert statement.sql.startswith("select balance_sheet_sort_helper, account_name, round(sum(transaction_amount),2) as balance")
+    assert "group by 1,2 " in statement.sql
+
+
+def test_books_periods_and_watermark_statements():
+    books = books_report_statement("Snowflake", "DB", "SCHEMA", 'bs', [1, 2])
+    assert books.positional()[1] == json.dumps(["1", "2"])
+    assert "order by accounting_book_id, balance_sheet_sort_helper" in books.sql
+    assert periods_statement("BigQuery", "DB", "SCHEMA", 'bs', 3).params == (('accounting_book_id', 3),)
+    assert "group by 1" in watermark_statement("Snowflake", "DB", "SCHEMA", 'is', 1).sql
+
+
+def test_unknown_dialects_are_rejected():
+    with pytest.raises(ValueError):
+        report_statement("Postgres", "DB", "SCHEMA", 'bs', 1)
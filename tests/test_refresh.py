@@ -0,0 +1,52 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.cache import ResultKey
+from functions.query import LoadPlan, WarehouseConnectionError
+from functions.refresh import RefreshScheduler
+
+KEY = ResultKey("Snowflake", "DB", "SCHEMA", "bs", 1, "REPORTING")
+
+
+def test_disabled_scheduler_keeps_no_plans():
+    scheduler = RefreshScheduler(lambda plan: plan.loader(), ThreadPoolExecutor(max_workers=1), interval_seconds=0)
+    scheduler.register(LoadPlan(KEY, lambda: None))
+    assert scheduler._plans == {} and scheduler._thread is None
+
+
+def test_idle_plans_are_pruned_on_register():
+    scheduler = RefreshScheduler(lambda plan: plan.loader(), ThreadPoolExecutor(max_workers=1), interval_seconds=3600, idle_seconds=60)
+    scheduler.register(LoadPlan(KEY, lambda: None))
+    scheduler._last_read[KEY] -= 120
+    other = KEY._replace(accounting_book_id=2)
+    scheduler.register(LoadPlan(other, lambda: None))
+    assert list(scheduler._plans) == [other]
+
+
+def test_max_staleness():
+    scheduler = RefreshScheduler(lambda plan: plan.loader(), ThreadPoolExecutor(max_workers=1), max_stale_seconds=60)
+    now = time.time()
+    assert not scheduler.too_stale(now - 30, now)
+    assert scheduler.too_stale(now - 90, now)
+    scheduler.max_stale_seconds = 0
+    assert not scheduler.too_stale(now - 90, now)
+
+
+def test_followers_retry_a_failed_load():
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait()
+        raise WarehouseConnectionError("bad credentials")
+
+    scheduler = RefreshScheduler(lambda plan: plan.loader(), ThreadPoolExecutor(max_workers=1))
+    leader = ThreadPoolExecutor(max_workers=1).submit(scheduler.load, LoadPlan(KEY, failing))
+    started.wait()
+    follower = ThreadPoolExecutor(max_workers=1).submit(scheduler.load, LoadPlan(KEY, lambda: "rows"))
+    time.sleep(0.05)
+    release.set()
+
+    assert isinstance(leader.exception(), WarehouseConnectionError)
+    assert follower.result() == "rows"
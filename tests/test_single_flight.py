@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from functions.single_flight import SingleFlight, normalise_sql
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return object()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, "sql", slow)
+        started.wait()
+        followers = [executor.submit(flight.do, "sql", slow) for _ in range(3)]
+        while flight.stats()["shared"] < 3:
+            pass
+        release.set()
+        results = [leader.result()] + [follower.result() for follower in followers]
+
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 1, "shared": 3, "in_flight": 0}
+
+
+def test_calls_after_completion_run_again():
+    flight = SingleFlight()
+    assert flight.do("sql", lambda: 1) == 1
+    assert flight.do("sql", lambda: 2) == 2
+    assert flight.stats()["calls"] == 2
+
+
+def test_failures_are_not_shared_with_waiting_callers():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait()
+        raise ValueError("bad credentials")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "sql", failing)
+        started.wait()
+        follower = executor.submit(flight.do, "sql", lambda: "rows")
+        while flight.stats()["shared"] < 1:
+            pass
+        release.set()
+        with pytest.raises(ValueError):
+            leader.result()
+        assert follower.result() == "rows"
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_normalise_sql():
+    assert normalise_sql("select *\n  from  t\twhere x = ?") == "select * from t where x = ?"
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from functions.cache import ResultKey
+from functions.snapshot import SnapshotStore, read_frame, write_frame
+
+KEY = ResultKey("Snowflake", "DB", "SCHEMA", "bs", 1, "REPORTING")
+
+
+def test_read_frame_round_trips(tmp_path):
+    frame = pd.DataFrame({
+        'account_name': pd.Categorical(["Cash", "Inventory"]),
+        'balance': [1.5, -2.0],
+        'period_key': pd.array([20240131, 20240229], dtype="int32"),
+    })
+    write_frame(str(tmp_path / "frame.feather"), frame)
+    pd.testing.assert_frame_equal(read_frame(str(tmp_path / "frame.feather")), frame)
+
+
+def test_keys_are_most_recent_first(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    frame = pd.DataFrame({'balance': [1.0]})
+    store.write(KEY, frame, fetched_at=100)
+    store.write(KEY._replace(model='is'), frame, fetched_at=200)
+    assert [key.model for key in SnapshotStore(str(tmp_path)).keys()] == ['is', 'bs']
@@ -0,0 +1,46 @@
+import math
+
+import pandas as pd
+
+from functions.query import _prepare_dates
+from functions.synthetic import period_endings, synthetic_report
+
+
+def test_period_endings_are_month_ends():
+    endings = period_endings(3, first='2023-11-30')
+    assert list(endings.strftime('%Y-%m-%d')) == ['2023-11-30', '2023-12-31', '2024-01-31']
+
+
+def test_report_is_shaped_like_the_sample(bs_raw):
+    report = synthetic_report('bs', rows=1000, periods=4, books=2)
+    sample = pd.read_csv('data/dunder_mifflin_balance_sheet.csv')
+    assert set(report.columns) == set(sample.columns) | {'accounting_book_id'}
+
+    accounts = math.ceil(1000 / (4 * 2))
+    assert len(report) == accounts * 4 * 2
+    assert report.groupby(['accounting_book_id', 'accounting_period_ending']).size().eq(accounts).all()
+    assert report['balance_sheet_sort_helper'].is_monotonic_increasing
+
+    # Warehouse timestamp strings parse into the generated month ends
+    endings = sorted(_prepare_dates(report[['accounting_period_ending']].copy())['accounting_period_ending'].unique())
+    assert endings == [d.date() for d in period_endings(4)]
+
+
+def test_accounts_follow_the_sample(bs_raw):
+    report = synthetic_report('bs', rows=5000, periods=2)
+
+    # Copies of a sample account keep its category and account type
+    base = report.assign(account_name=report['account_name'].str.replace(r' \d{4}$', '', regex=True))
+    columns = ['account_category', 'account_type_name', 'account_name']
+    assert set(base[columns].itertuples(index=False)) == set(bs_raw[columns].itertuples(index=False))
+
+    # Accounts whose sample balances are all positive stay positive
+    positive = bs_raw.groupby(columns)['balance'].min().gt(0).rename('positive').reset_index()
+    merged = base.merge(positive, on=columns)
+    assert len(merged) == len(report)
+    assert merged.loc[merged['positive'], 'balance'].gt(0).all()
+
+
+def test_seed_makes_reports_repeatable():
+    pd.testing.assert_frame_equal(synthetic_report('is', rows=500, seed=1), synthetic_report('is', rows=500, seed=1))
+    assert not synthetic_report('is', rows=500, seed=1)['balance'].equals(synthetic_report('is', rows=500, seed=2)['balance'])
@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+from functions.cube import cube_for
+from functions.windows import history_start, income_metrics, metric_trend, window_start
+
+NOV = datetime.date(2023, 11, 30)
+
+
+def test_window_starts(monkeypatch):
+    assert window_start(NOV, 'ttm') == datetime.date(2022, 12, 1)
+    assert window_start(NOV, 'ytd') == datetime.date(2023, 1, 1)
+    assert window_start(NOV, 'qtd') == datetime.date(2023, 10, 1)
+    assert window_start(NOV, 'range', start=datetime.date(2023, 7, 31)) == datetime.date(2023, 7, 31)
+
+    # Fiscal years starting in July move the year and quarter boundaries
+    monkeypatch.setenv("FISCAL_YEAR_START_MONTH", "7")
+    assert window_start(NOV, 'ytd') == datetime.date(2023, 7, 1)
+    assert window_start(NOV, 'qtd') == datetime.date(2023, 10, 1)
+    assert window_start(datetime.date(2024, 3, 31), 'ytd') == datetime.date(2023, 7, 1)
+
+    with pytest.raises(ValueError):
+        window_start(NOV, 'mtd')
+
+
+def test_history_start_covers_every_trend_window():
+    assert history_start(NOV) == datetime.date(2022, 1, 1)
+    assert history_start(NOV, datetime.date(2020, 1, 31)) == datetime.date(2020, 1, 31)
+
+
+def _expected(raw, start, end):
+    rows = raw[(raw['accounting_period_ending'] >= start) & (raw['accounting_period_ending'] <= end)]
+    revenue = rows.loc[rows['account_category'] == 'Income', 'balance'].sum()
+    cogs = rows.loc[rows['account_type_name'] == 'Cost of Goods Sold', 'balance'].sum()
+    expense = rows.loc[rows['account_category'] == 'Expense', 'balance'].sum()
+    return revenue, cogs, expense
+
+
+@pytest.mark.parametrize("window", ['range', 'ytd', 'qtd', 'ttm'])
+def test_income_metrics_match_pandas(window, is_raw, is_data):
+    endings = sorted(is_raw['accounting_period_ending'].unique())
+    end = endings[-1]
+    metrics = income_metrics(cube_for(is_data), end, window, start=endings[2])
+
+    revenue, cogs, expense = _expected(is_raw, window_start(end, window, endings[2]), end)
+    assert metrics.revenue == pytest.approx(revenue)
+    assert metrics.cogs == pytest.approx(cogs)
+    assert metrics.expense == pytest.approx(expense)
+    assert metrics.gross_margin == pytest.approx((revenue + cogs) / revenue * 100)
+    assert metrics.net_margin == pytest.approx((revenue + expense) / revenue * 100)
+
+
+def test_metric_trend_points(is_raw, is_data):
+    cube = cube_for(is_data)
+    endings = sorted(is_raw['accounting_period_ending'].unique())
+    trend = metric_trend(cube, endings[-1], 'revenue', 'range', start=endings[0], points=3)
+    assert list(trend.index) == endings[-3:]
+    assert list(trend) == pytest.approx([_expected(is_raw, ending, ending)[0] for ending in endings[-3:]])
+
+    ytd = metric_trend(cube, endings[-1], 'revenue', 'ytd', points=2)
+    assert list(ytd) == pytest.approx([_expected(is_raw, window_start(ending, 'ytd'), ending)[0] for ending in endings[-2:]])